@@ -20,6 +20,16 @@ logging.info("Hello")
 
 
 def call_java_object():
+    try:
+        # 由 runner.py 加载时使用注入的 java_bridge：请求在本周期末与其他模块的请求合并成一次调用
+        bridge = java_bridge
+    except NameError:
+        bridge = None
+    if bridge is not None:
+        future = bridge.submit("Hello from a.py Python to Java")
+        future.add_done_callback(_log_java_result)
+        return
+
     try:
 
         # logging.info("Java receiver object: %s", java_receiver)
@@ -39,6 +49,13 @@ def call_java_object():
         logging.error("Error calling Java object: %s", e)
 
 
+def _log_java_result(future):
+    try:
+        logging.info("Java object processed data, result！！: %s", future.result())
+    except Exception as e:
+        logging.error("Error calling Java object: %s", e)
+
+
 # 生成柱状图函数，无 CLI 依赖
 def create_bar_chart(output_file: str, rounded_bars: bool = False):
     pass
@@ -109,7 +126,8 @@ def execute():
 import resource
 
 def get_memory_usage_mb():
+    # ru_maxrss 是进程级峰值，Linux 上单位为 KB；按模块的内存归因见 runner.py 的 RUNNER_MEMORY_SAMPLE_EVERY
     usage = resource.getrusage(resource.RUSAGE_SELF)
-    return usage.ru_maxrss   # 单位: MB
+    return usage.ru_maxrss / 1024
 
 
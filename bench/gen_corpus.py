@@ -0,0 +1,207 @@
+"""
+生成基准测试用的插件语料目录。
+
+每个插件是一个带 execute() 的 .py 文件，按 --mix 指定的比例混合以下几类：
+    trivial     只做一点纯 Python 计算，内容各不相同
+    numpy       矩阵运算；没有安装 NumPy 时退回等量的纯 Python 计算
+    slow        execute() 中 sleep 若干毫秒，模拟 I/O 型插件
+    failing     语法错误、模块级异常或 execute() 抛异常，三种失败方式轮流出现
+    disallowed  导入 os/subprocess 等被禁止的模块
+    duplicate   与 a.sh 复制出的文件一样，内容逐字节相同，并通过 polyglot 调用 javaDataReceiver
+    http        通过 runner.py 注入的 http_client 请求 --http-url（见 http_stub.py）；
+                其他版本没有 http_client，这类插件在它们下面执行失败。默认比例为 0
+
+同一组 (size, mix, seed) 生成的目录内容完全一致。用法:
+    python bench/gen_corpus.py --size 10000 --out /tmp/corpus_10k
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+
+PROFILES = ("trivial", "numpy", "slow", "failing", "disallowed", "duplicate", "http")
+DEFAULT_MIX = "trivial=60,numpy=10,slow=1,failing=5,disallowed=4,duplicate=20"
+MANIFEST = "corpus.json"
+DEFAULT_HTTP_URL = "http://127.0.0.1:18080"
+
+TRIVIAL = '''PLUGIN_ID = {index}
+
+
+def execute():
+    total = 0
+    for i in range({work}):
+        total += i * PLUGIN_ID
+    return total
+'''
+
+NUMPY = '''PLUGIN_ID = {index}
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ROWS = {rows}
+
+
+def execute():
+    if np is not None:
+        a = np.arange(ROWS * 16, dtype=np.float64).reshape(ROWS, 16) + PLUGIN_ID
+        return float((a @ a.T).sum())
+    rows = [[float(r * 16 + c + PLUGIN_ID) for c in range(16)] for r in range(ROWS)]
+    return sum(sum(x * y for x, y in zip(r1, r2)) for r1 in rows for r2 in rows)
+'''
+
+SLOW = '''import time
+
+PLUGIN_ID = {index}
+
+
+def execute():
+    time.sleep({sleep_ms} / 1000)
+    return PLUGIN_ID
+'''
+
+FAILING = (
+    # 加载失败：语法错误
+    '''PLUGIN_ID = {index}
+
+
+def execute(:
+    return PLUGIN_ID
+''',
+    # 加载失败：模块级代码抛异常
+    '''PLUGIN_ID = {index}
+
+raise RuntimeError("plugin %d failed at import" % PLUGIN_ID)
+
+
+def execute():
+    return PLUGIN_ID
+''',
+    # 执行失败
+    '''PLUGIN_ID = {index}
+
+
+def execute():
+    raise RuntimeError("plugin %d failed" % PLUGIN_ID)
+''',
+)
+
+DISALLOWED = '''import os
+import subprocess
+
+PLUGIN_ID = {index}
+
+
+def execute():
+    return os.getpid() + PLUGIN_ID
+'''
+
+HTTP = '''PLUGIN_ID = {index}
+
+
+def execute():
+    response = http_client.get("{http_url}/plugin/{index}")
+    response.raise_for_status()
+    return response.json()["path"]
+'''
+
+# 所有 duplicate 插件共用同一份源码
+DUPLICATE = '''import polyglot
+
+
+def execute():
+    receiver = polyglot.import_value("javaDataReceiver")
+    return receiver.processDataFunc().apply("Hello from plugin")
+'''
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in PROFILES:
+            raise ValueError(f"未知的插件类型: {name}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("插件类型比例之和必须大于 0")
+    return mix
+
+
+def profile_counts(size, mix):
+    """按比例分配各类插件个数，余数按小数部分从大到小补齐，保证总数等于 size。"""
+    total = sum(mix.values())
+    exact = {name: size * weight / total for name, weight in mix.items()}
+    counts = {name: int(value) for name, value in exact.items()}
+    rest = size - sum(counts.values())
+    for name in sorted(exact, key=lambda n: exact[n] - counts[n], reverse=True)[:rest]:
+        counts[name] += 1
+    return counts
+
+
+def render(profile, index, rng, sleep_ms, http_url=DEFAULT_HTTP_URL):
+    if profile == "trivial":
+        return TRIVIAL.format(index=index, work=rng.randint(50, 500))
+    if profile == "numpy":
+        return NUMPY.format(index=index, rows=rng.choice((32, 64, 96)))
+    if profile == "slow":
+        return SLOW.format(index=index, sleep_ms=sleep_ms)
+    if profile == "failing":
+        return FAILING[index % len(FAILING)].format(index=index)
+    if profile == "disallowed":
+        return DISALLOWED.format(index=index)
+    if profile == "http":
+        return HTTP.format(index=index, http_url=http_url)
+    return DUPLICATE
+
+
+def generate(out_dir, size, mix=DEFAULT_MIX, seed=1, sleep_ms=20, http_url=DEFAULT_HTTP_URL):
+    """生成语料目录；目录中已有相同参数生成的语料时直接复用。返回清单。"""
+    mix = parse_mix(mix) if isinstance(mix, str) else dict(mix)
+    manifest = {"size": size, "mix": mix, "seed": seed, "sleep_ms": sleep_ms, "http_url": http_url}
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            existing = json.load(f)
+        if {k: existing.get(k) for k in manifest} == manifest:
+            return existing
+    except (OSError, ValueError):
+        pass
+
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    counts = profile_counts(size, mix)
+    profiles = [name for name in PROFILES for _ in range(counts.get(name, 0))]
+    rng = random.Random(seed)
+    rng.shuffle(profiles)
+    for index, profile in enumerate(profiles):
+        path = os.path.join(out_dir, f"plugin_{index:05d}_{profile}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render(profile, index, rng, sleep_ms, http_url))
+
+    manifest["counts"] = counts
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成基准测试插件语料")
+    parser.add_argument("--size", type=int, required=True, help="插件个数")
+    parser.add_argument("--out", required=True, help="输出目录（会被清空重建）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"各类插件比例，默认 {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sleep-ms", type=int, default=20, help="slow 插件每次执行的耗时")
+    parser.add_argument("--http-url", default=DEFAULT_HTTP_URL, help="http 插件请求的服务地址")
+    args = parser.parse_args()
+    manifest = generate(args.out, args.size, args.mix, args.seed, args.sleep_ms, args.http_url)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+本地 HTTP 服务替身，代替插件访问的外部服务，用于测试和基准测试 runner.py 注入的 http_client。
+
+所有路径都返回一小段 JSON，带 ETag 和 Cache-Control: max-age（默认 0，即每次都要重新验证）；
+请求带匹配的 If-None-Match 时返回 304。服务器使用 HTTP/1.1 keep-alive，
+并统计收到的请求数、304 次数和建立的 TCP 连接数，据此可以判断连接是否被复用、缓存是否生效。
+
+单独运行:
+    python bench/http_stub.py --port 18080 --max-age 60
+在代码中使用:
+    with HttpStub() as stub:
+        ... stub.url("/plugin/1") ...
+        print(stub.stats())
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，不关闭 Nagle 时每个响应都会被延迟确认拖慢约 40 毫秒
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        if server.delay:
+            time.sleep(server.delay)
+        body = json.dumps({"path": self.path, "version": server.version}).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            server.count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"max-age={server.max_age}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"max-age={server.max_age}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, max_age=0, delay=0.0):
+        super().__init__(address, StubHandler)
+        self.max_age = max_age
+        self.delay = delay
+        self.version = 1  # 修改后所有资源的 ETag 都会变化
+        self.lock = threading.Lock()
+        self.counters = {"connections": 0, "requests": 0, "not_modified": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+
+class HttpStub:
+    """在后台线程中运行 StubServer；port 为 0 时使用随机空闲端口。"""
+
+    def __init__(self, host="127.0.0.1", port=0, max_age=0, delay=0.0):
+        self.server = StubServer((host, port), max_age, delay)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="http-stub", daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def url(self, path="/"):
+        return f"http://{self.server.server_address[0]}:{self.port}{path}"
+
+    def stats(self):
+        with self.server.lock:
+            return dict(self.server.counters)
+
+    def reset_stats(self):
+        with self.server.lock:
+            for name in self.server.counters:
+                self.server.counters[name] = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 HTTP 服务替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--max-age", type=int, default=0, help="响应的 Cache-Control: max-age（秒）")
+    parser.add_argument("--delay-ms", type=float, default=0, help="每个请求的响应延迟，模拟远端服务")
+    args = parser.parse_args()
+    stub = HttpStub(args.host, args.port, args.max_age, args.delay_ms / 1000)
+    print(f"listening on {stub.url()}", flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(stub.stats()), flush=True)
+
+
+if __name__ == "__main__":
+    main()
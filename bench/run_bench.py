@@ -0,0 +1,247 @@
+"""
+runner 各版本的基准测试：脱离 Micronaut/GraalPy，在普通 Python 进程中加载并执行合成插件语料。
+
+对每个 (语料规模, runner 版本) 组合启动一个独立子进程，子进程与 PythonRunnerTask 一样
+exec 脚本源码，再连续调用若干次 load_all_py_files（filter_module 逐个调用 load_and_modify_module）。
+polyglot 由 bench/stubs/polyglot.py 提供；默认还用 bench/stubs/offline/requests.py 替换 requests，
+避免 runner0–runner4 每个周期的外网请求干扰结果。
+
+输出 JSON，每个组合包括：
+    phases          import（exec 脚本）、cold_cycle（首个周期）、warm_cycles（之后各周期）耗时，秒
+    throughput      冷/热周期每秒处理的插件数
+    peak_rss_mb     子进程峰值常驻内存；children_peak_rss_mb 为其派生的编译/执行子进程的峰值
+    runner_metrics  runner.py 自带的 runnerMetrics 快照（各阶段直方图、计数器）
+    http_stub       语料含 http 插件时，本地 HTTP 替身收到的请求数、304 次数和 TCP 连接数
+
+用法:
+    python bench/run_bench.py --sizes 1000,10000,20000 --output bench_results.json
+    python bench/run_bench.py --sizes 1000 --variants runner,runner4 --cycles 5
+    python bench/run_bench.py --sizes 1000 --variants runner --mix trivial=50,http=50
+
+每个子进程在单独的工作目录中运行（日志、runner.py 的代码缓存都写在这里），运行前清空，
+因此 cold_cycle 总是冷缓存的结果。
+"""
+import argparse
+import builtins
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+VFS_DIR = os.path.join(REPO_DIR, "src", "main", "resources", "org", "graalvm", "python", "vfs")
+STUBS_DIR = os.path.join(BENCH_DIR, "stubs")
+OFFLINE_STUBS_DIR = os.path.join(STUBS_DIR, "offline")
+
+VARIANTS = ("runner", "runner0", "runner1", "runner2", "runner3", "runner4", "filter_module")
+
+sys.path.insert(0, BENCH_DIR)
+import gen_corpus  # noqa: E402
+from http_stub import HttpStub  # noqa: E402
+
+
+def peak_rss_mb(who):
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def drive_load_all(namespace, corpus):
+    load_all = namespace["load_all_py_files"]
+    if load_all.__code__.co_argcount:
+        load_all(corpus)
+    else:
+        load_all()
+
+
+def drive_filter_module(namespace, corpus):
+    load = namespace["load_and_modify_module"]
+    failures = 0
+    for name in sorted(os.listdir(corpus)):
+        if name.endswith(".py"):
+            try:
+                load(os.path.join(corpus, name))
+            except Exception:
+                failures += 1
+    return failures
+
+
+DRIVERS = {"filter_module": drive_filter_module}
+
+
+def run_child(variant, corpus, cycles):
+    """子进程：加载一个 runner 版本并对语料跑 cycles 个周期，返回结果字典。"""
+    script = os.path.join(VFS_DIR, variant + ".py")
+    with open(script, encoding="utf-8") as f:
+        source = f.read()
+
+    start = time.perf_counter()
+    namespace = {"__name__": "bench_" + variant, "__file__": script, "__builtins__": builtins}
+    exec(compile(source, script, "exec"), namespace)
+    import_seconds = time.perf_counter() - start
+
+    driver = DRIVERS.get(variant, drive_load_all)
+    cycle_seconds = []
+    errors = []
+    failures = None
+    for _ in range(cycles):
+        start = time.perf_counter()
+        try:
+            failures = driver(namespace, corpus)
+        except Exception as e:
+            errors.append(repr(e))
+        cycle_seconds.append(time.perf_counter() - start)
+
+    size = sum(1 for name in os.listdir(corpus) if name.endswith(".py"))
+    cold, warm = cycle_seconds[0], cycle_seconds[1:]
+    warm_median = statistics.median(warm) if warm else None
+    result = {
+        "variant": variant,
+        "size": size,
+        "phases": {
+            "import": round(import_seconds, 6),
+            "cold_cycle": round(cold, 6),
+            "warm_cycles": [round(s, 6) for s in warm],
+            "warm_cycle_median": None if warm_median is None else round(warm_median, 6),
+        },
+        "throughput": {
+            "cold_plugins_per_second": round(size / cold, 1) if cold else None,
+            "warm_plugins_per_second": round(size / warm_median, 1) if warm_median else None,
+        },
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "errors": errors,
+    }
+    if failures is not None:
+        result["plugin_failures_last_cycle"] = failures
+
+    import polyglot
+    result["java_bridge_calls"] = polyglot.java_data_receiver.calls
+    metrics_fn = namespace.get("runner_metrics")
+    if metrics_fn is not None:
+        result["runner_metrics"] = json.loads(metrics_fn())
+    return result
+
+
+def run_variant(variant, corpus, cycles, work_dir, timeout, network):
+    """父进程：在干净的工作目录中启动子进程运行一个组合。"""
+    if os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+    result_path = os.path.join(work_dir, "result.json")
+
+    env = dict(os.environ)
+    paths = [STUBS_DIR] if network else [STUBS_DIR, OFFLINE_STUBS_DIR]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    env["BENCH_MODULE_PATH"] = corpus
+
+    command = [sys.executable, os.path.abspath(__file__), "--child", variant,
+               "--corpus", corpus, "--cycles", str(cycles), "--result-file", result_path]
+    start = time.perf_counter()
+    # 各版本的日志量很大，输出写到工作目录而不是管道
+    with open(os.path.join(work_dir, "output.log"), "wb") as log:
+        try:
+            proc = subprocess.run(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                  timeout=timeout)
+            returncode = proc.returncode
+        except subprocess.TimeoutExpired:
+            returncode = None
+    wall = round(time.perf_counter() - start, 3)
+
+    try:
+        with open(result_path, encoding="utf-8") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        result = {"variant": variant,
+                  "errors": ["timeout" if returncode is None else f"子进程退出码 {returncode}"]}
+    result["wall_seconds"] = wall
+    return result
+
+
+def environment_info():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy_version,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="runner 各版本的基准测试")
+    parser.add_argument("--sizes", default="1000,10000,20000", help="语料规模，逗号分隔")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="要测的版本，逗号分隔")
+    parser.add_argument("--cycles", type=int, default=3, help="每个组合运行的周期数（第一个为冷周期）")
+    parser.add_argument("--mix", default=gen_corpus.DEFAULT_MIX, help="插件类型比例，见 gen_corpus.py")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sleep-ms", type=int, default=20, help="slow 插件每次执行的耗时")
+    parser.add_argument("--work-root", default=os.path.join(BENCH_DIR, ".work"),
+                        help="语料和工作目录的根目录")
+    parser.add_argument("--timeout", type=float, default=1800, help="单个组合的超时时间，秒")
+    parser.add_argument("--network", action="store_true", help="使用真实的 requests，不替换为离线替身")
+    parser.add_argument("--http-port", type=int, default=18080, help="语料含 http 插件时本地 HTTP 替身的端口")
+    parser.add_argument("--output", help="结果 JSON 文件；不指定时只打印")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(args.child, args.corpus, max(1, args.cycles))
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        # 跳过各版本在解释器退出时的清理逻辑（日志线程、进程池等），结果已经写出
+        os._exit(0)
+
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"未知的版本: {', '.join(sorted(unknown))}")
+
+    # http 插件访问本地替身而不是外部服务，地址写进语料源码，所以端口固定
+    stub = HttpStub(port=args.http_port).start() if gen_corpus.parse_mix(args.mix).get("http") else None
+    http_url = stub.url() if stub else gen_corpus.DEFAULT_HTTP_URL
+
+    report = {"environment": environment_info(), "cycles": args.cycles, "results": []}
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            corpus = os.path.join(args.work_root, f"corpus_{size}")
+            manifest = gen_corpus.generate(corpus, size, args.mix, args.seed, args.sleep_ms, http_url)
+            report.setdefault("corpora", {})[size] = manifest
+            for variant in variants:
+                work_dir = os.path.join(args.work_root, f"{variant}_{size}")
+                print(f"运行 {variant} @ {size} ...", file=sys.stderr, flush=True)
+                if stub:
+                    stub.reset_stats()
+                result = run_variant(variant, corpus, args.cycles, work_dir, args.timeout, args.network)
+                result["size"] = size
+                if stub:
+                    result["http_stub"] = stub.stats()
+                report["results"].append(result)
+    finally:
+        if stub:
+            stub.stop()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+runner 启动耗时预算检查，可在 CI 中运行：超出预算或启动时导入了禁止的模块时以退出码 1 结束。
+
+每次在新的解释器进程中 exec 一遍脚本（与 PythonRunnerTask 的 context.eval 相同，含编译），
+取 --runs 次的中位数与 --budget-ms 比较；runner.py 还会附带 runnerStartupReport 中各模块的导入耗时。
+--python 可以指定 graalpy，从而测量嵌入环境所用解释器下的真实开销。
+
+用法:
+    python bench/startup_budget.py --budget-ms 150
+    python bench/startup_budget.py --python graalpy --script src/main/resources/org/graalvm/python/vfs/runner4.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+VFS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src", "main", "resources", "org", "graalvm", "python", "vfs")
+STUBS_DIR = os.path.join(BENCH_DIR, "stubs")
+
+# 启动时不应导入的模块：只在插件或首个周期中才需要
+DEFAULT_FORBIDDEN = "requests,numpy,hashlib,unicodedata,ast,concurrent.futures,multiprocessing,ctypes,asyncio"
+
+CHILD = r'''
+import json, os, sys, time
+path = sys.argv[1]
+before = set(sys.modules)
+start = time.perf_counter()
+namespace = {"__name__": "startup_check", "__file__": path}
+with open(path, encoding="utf-8") as f:
+    exec(compile(f.read(), path, "exec"), namespace)
+elapsed = time.perf_counter() - start
+report = namespace.get("runner_startup_report")
+result = json.loads(report()) if report else {}
+result["exec_seconds"] = elapsed
+result["new_modules"] = sorted(set(sys.modules) - before)
+sys.stdout.write("\n" + json.dumps(result) + "\n")
+sys.stdout.flush()
+os._exit(0)
+'''
+
+
+def run_once(python, script, env):
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        proc = subprocess.run([python, "-c", CHILD, script], cwd=work_dir, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=300)
+        process_seconds = time.perf_counter() - start
+    lines = proc.stdout.decode("utf-8", "replace").strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{script} 启动失败，退出码 {proc.returncode}")
+    result = json.loads(lines[-1])
+    result["process_seconds"] = process_seconds
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="runner 启动耗时预算检查")
+    parser.add_argument("--python", default=sys.executable, help="解释器，默认当前解释器")
+    parser.add_argument("--script", default=os.path.join(VFS_DIR, "runner.py"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("RUNNER_STARTUP_BUDGET_MS", "250")),
+                        help="脚本 exec 耗时中位数的上限（毫秒）")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help="启动时不允许导入的模块，逗号分隔")
+    parser.add_argument("--top", type=int, default=15, help="报告中列出的最慢导入个数")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (STUBS_DIR, env.get("PYTHONPATH")) if p)
+    runs = [run_once(args.python, os.path.abspath(args.script), env) for _ in range(max(1, args.runs))]
+
+    exec_median = statistics.median(r["exec_seconds"] for r in runs)
+    forbidden = [m for m in args.forbid.split(",") if m]
+    imported = sorted({m for r in runs for m in r["new_modules"]
+                       if any(m == f or m.startswith(f + ".") for f in forbidden)})
+    failures = []
+    if exec_median * 1000 > args.budget_ms:
+        failures.append(f"启动耗时中位数 {exec_median * 1000:.1f} ms 超出预算 {args.budget_ms:.1f} ms")
+    if imported:
+        failures.append(f"启动时导入了禁止的模块: {', '.join(imported)}")
+
+    last = runs[-1]
+    report = {
+        "script": os.path.relpath(args.script),
+        "python": args.python,
+        "runs": len(runs),
+        "budget_ms": args.budget_ms,
+        "exec_ms_median": round(exec_median * 1000, 3),
+        "exec_ms": [round(r["exec_seconds"] * 1000, 3) for r in runs],
+        "process_ms_median": round(statistics.median(r["process_seconds"] for r in runs) * 1000, 3),
+        "startup_seconds": last.get("startup_seconds"),
+        "slowest_imports": last.get("imports", [])[:args.top],
+        "new_module_count": len(last["new_modules"]),
+        "failures": failures,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
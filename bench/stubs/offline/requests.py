@@ -0,0 +1,23 @@
+"""
+离线基准测试用的 requests 替身：runner0–runner4 每个周期都会请求一次 https://www.baidu.com，
+网络延迟会淹没要测的加载/执行开销。run_bench.py 默认把本目录（bench/stubs/offline）放在 sys.path 最前面，
+加 --network 时不使用这些替身。
+"""
+
+
+class Response:
+    status_code = 200
+    text = ""
+    content = b""
+    headers = {}
+
+    def json(self):
+        return {}
+
+
+def get(url, **kwargs):
+    return Response()
+
+
+def post(url, data=None, json=None, **kwargs):
+    return Response()
@@ -0,0 +1,52 @@
+"""
+GraalPy polyglot 模块的本地替身，供基准测试在普通 CPython 下运行 runner 各版本。
+pythonModulePath 取自环境变量 BENCH_MODULE_PATH；javaDataReceiver 模拟 JavaDataReceiver，
+只做字符串拼接并统计跨边界调用次数（calls），不引入 Java 侧的开销。
+"""
+import os
+import threading
+
+_values = {}
+
+
+class JavaDataReceiverStub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.results = 0
+
+    def processData(self, data):
+        with self.lock:
+            self.calls += 1
+        return "Processed: " + str(data)
+
+    def processDataBatch(self, payloads):
+        with self.lock:
+            self.calls += 1
+        return ["Processed: " + str(data) for data in payloads]
+
+    def processResults(self, batch):
+        with self.lock:
+            self.calls += 1
+            self.results += batch.count("\n")
+        return batch.count("\n")
+
+    def processDataFunc(self):
+        return self
+
+    # processDataFunc() 在 Java 侧返回 Function，Python 侧调用的是 apply()
+    def apply(self, data):
+        return self.processData(data)
+
+
+java_data_receiver = JavaDataReceiverStub()
+_values["javaDataReceiver"] = java_data_receiver
+_values["pythonModulePath"] = os.environ.get("BENCH_MODULE_PATH", os.getcwd())
+
+
+def import_value(name):
+    return _values.get(name)
+
+
+def export_value(name, value):
+    _values[name] = value
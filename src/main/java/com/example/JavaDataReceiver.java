@@ -3,6 +3,8 @@ package com.example;
 import java.util.function.Function;
 
 import org.graalvm.polyglot.HostAccess;
+import org.graalvm.polyglot.Value;
+import org.graalvm.polyglot.proxy.ProxyArray;
 import org.slf4j.Logger;
 import org.slf4j.LoggerFactory;
 
@@ -14,6 +16,8 @@ import io.micronaut.core.annotation.ReflectionConfig.ReflectiveMethodConfig;
   methods = {
     @ReflectiveMethodConfig(name = "processData", parameterTypes = { java.lang.String.class }),
     @ReflectiveMethodConfig(name = "processDataFunc", parameterTypes = { }),
+    @ReflectiveMethodConfig(name = "processDataBatch", parameterTypes = { org.graalvm.polyglot.Value.class }),
+    @ReflectiveMethodConfig(name = "processResults", parameterTypes = { java.lang.String.class }),
     @ReflectiveMethodConfig(name = "processOther", parameterTypes = { })
   }
 )
@@ -26,6 +30,31 @@ public class JavaDataReceiver {
         return "Processed: " + data;
     }
 
+    /**
+     * 批量版本的 processData：Python 侧 runner 的 java_bridge 把一个周期内缓冲的请求打包成一个列表，
+     * 只跨越一次语言边界。返回与输入等长、顺序一致的结果数组。
+     */
+    @HostAccess.Export
+    public ProxyArray processDataBatch(Value payloads) {
+        int size = (int) payloads.getArraySize();
+        Object[] results = new Object[size];
+        for (int i = 0; i < size; i++) {
+            results[i] = processData(payloads.getArrayElement(i).asString());
+        }
+        return ProxyArray.fromArray(results);
+    }
+
+    /**
+     * runner 的执行结果出口：插件 execute() 的返回值按批编码成 JSON Lines（每行 [模块名, 结果, 时间戳]），
+     * 一批只调用一次。返回收到的结果条数。
+     */
+    @HostAccess.Export
+    public int processResults(String batch) {
+        int count = (int) batch.lines().count();
+        logger.debug("JavaDataReceiver received {} results", count);
+        return count;
+    }
+
     private final Function<String, String> processFunc = new ProcessDataFunction(this);
 
     @HostAccess.Export
@@ -21,10 +21,26 @@ public class PythonRunnerTask implements Runnable {
 
     private boolean initialized = false;
 
+    // 最近一次从 Python 侧取到的指标快照（JSON）
+    private volatile String lastMetrics;
+
+    // 本上下文负责的插件分片；PythonPool 中每个上下文各用一个分片号，shardCount 为 1 时不分片
+    private final int shardId;
+    private final int shardCount;
+
     
     public PythonRunnerTask(Context context, Configurations configurations) {
+        this(context, configurations, 0, 1);
+    }
+
+    public PythonRunnerTask(Context context, Configurations configurations, int shardId, int shardCount) {
+        if (shardCount < 1 || shardId < 0 || shardId >= shardCount) {
+            throw new IllegalArgumentException("Invalid shard " + shardId + "/" + shardCount);
+        }
         this.configurations = configurations;
         this.context = context;
+        this.shardId = shardId;
+        this.shardCount = shardCount;
     }
 
     @Override
@@ -76,7 +92,10 @@ public class PythonRunnerTask implements Runnable {
 
 
                 context.eval("python", initScript);
+                long evalStart = System.nanoTime();
                 context.eval("python", runnerScript);
+                logger.info("runner.py 初始化耗时 {} ms", (System.nanoTime() - evalStart) / 1_000_000);
+                logStartupReport();
 
                 initialized = true;
             }
@@ -93,8 +112,10 @@ public class PythonRunnerTask implements Runnable {
             
             if (pyFileLoader != null && pyFileLoader.canExecute()) {
                 try {
-                    pyFileLoader.execute(pythonHome);
-                    logger.info("Successfully executed Python file loader with home: {}", pythonHome);
+                    pyFileLoader.execute(pythonHome, shardId, shardCount);
+                    logger.info("Successfully executed Python file loader with home: {} (shard {}/{})",
+                        pythonHome, shardId, shardCount);
+                    pollMetrics();
                 } catch (PolyglotException e) {
                     logger.error("Python execution failed: {}", e.getMessage());
                     throw new IOException("Python file loading failed", e);
@@ -110,4 +131,30 @@ public class PythonRunnerTask implements Runnable {
             logger.error("Error executing PythonRunnerTask", e);
         }
     }
+
+    /**
+     * 读取 runner.py 导出的 runnerMetrics 指标快照（JSON 字符串）。
+     * 必须在执行 Python 的同一线程中调用，这里放在每次 load_all_py_files 之后。
+     */
+    private void pollMetrics() {
+        Value metrics = context.getPolyglotBindings().getMember("runnerMetrics");
+        if (metrics != null && metrics.canExecute()) {
+            lastMetrics = metrics.execute().asString();
+            logger.debug("Python runner metrics: {}", lastMetrics);
+        }
+    }
+
+    /**
+     * 输出 runner.py 导出的 runnerStartupReport（启动耗时与各模块导入耗时，JSON 字符串）。
+     */
+    private void logStartupReport() {
+        Value report = context.getPolyglotBindings().getMember("runnerStartupReport");
+        if (report != null && report.canExecute()) {
+            logger.debug("Python runner startup report: {}", report.execute().asString());
+        }
+    }
+
+    public String getLastMetrics() {
+        return lastMetrics;
+    }
 }
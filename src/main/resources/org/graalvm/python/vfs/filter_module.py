@@ -1,5 +1,6 @@
 import ast
 import types
+import marshal
 import logging
 
 # 设置日志以便调试
@@ -61,6 +62,70 @@ def load_and_modify_module(file_path):
     else:
         logging.info("模块中没有定义 'execute' 方法。")
 
+# 文件数达到该值才使用进程池并行编译，否则 fork 进程池的开销大于收益
+PARALLEL_COMPILE_MIN_FILES = 64
+
+def _compile_modified(file_path):
+    """
+    读取并清洗单个文件，返回 (marshal 序列化后的代码对象, None)，失败时返回 (None, 错误信息)，
+    结果可跨进程传输，单个文件出错不影响同批其他文件。
+    """
+    try:
+        with open(file_path, 'r') as file:
+            source_code = file.read()
+        tree = ImportRemover().visit(ast.parse(source_code))
+        tree = ast.fix_missing_locations(tree)
+        return marshal.dumps(compile(tree, filename=file_path, mode='exec')), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _compile_in_pool(file_paths):
+    """
+    在 fork 出的进程池中编译。本文件由宿主直接 exec 时所在命名空间不能按模块名导入，
+    把任务函数挂到一个已注册的模块上，子进程按引用反序列化即可找到它。
+    """
+    import sys
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    if _compile_modified.__module__ != "_filter_module_workers":
+        workers_module = sys.modules.setdefault("_filter_module_workers", types.ModuleType("_filter_module_workers"))
+        workers_module._compile_modified = _compile_modified
+        _compile_modified.__module__ = "_filter_module_workers"
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(pool.map(_compile_modified, file_paths))
+
+def load_and_modify_modules(file_paths):
+    """
+    批量版本的 load_and_modify_module：文件较多时解析、清洗、编译分发到进程池并行完成，
+    随后在本进程中按顺序执行各模块及其 execute 方法。
+    多进程不可用（如 GraalPy 下无法 fork）或进程池出错时退回本进程逐个编译；
+    编译或执行失败的文件记录错误后跳过，不影响其他文件。
+    """
+    file_paths = list(file_paths)
+    results = None
+    if len(file_paths) >= PARALLEL_COMPILE_MIN_FILES:
+        try:
+            results = _compile_in_pool(file_paths)
+        except Exception as e:
+            logging.info("进程池不可用，改为本进程编译: %s", e)
+    if results is None:
+        results = [_compile_modified(file_path) for file_path in file_paths]
+
+    for file_path, (payload, error) in zip(file_paths, results):
+        if payload is None:
+            logging.error("编译模块 %s 失败: %s", file_path, error)
+            continue
+        try:
+            module = types.ModuleType('modified_module')
+            module.__file__ = file_path
+            exec(marshal.loads(payload), module.__dict__)
+            if hasattr(module, 'execute') and callable(module.execute):
+                module.execute()
+            else:
+                logging.info("模块 %s 中没有定义 'execute' 方法。", file_path)
+        except Exception as e:
+            logging.error("执行模块 %s 失败: %s", file_path, e)
+
 # 示例用法
 if __name__ == '__main__':
     # 假设有一个文件 'example.py'，内容如下：
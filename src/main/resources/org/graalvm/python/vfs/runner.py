@@ -1,98 +1,2096 @@
-import os
 import sys
 import time
+import builtins
+import _thread
+
+_runner_started = time.perf_counter()
+
+
+class ImportTimer:
+    """
+    统计 runner 启动期间每个模块的导入耗时，包装 builtins.__import__，只记录首次导入且只看启动线程。
+    每项记录 self（扣除嵌套导入后的自身耗时）与 cumulative（含嵌套导入）两个值，单位秒。
+    GraalPy 下不一定支持 -X importtime，这里的结果反映的是嵌入环境中的真实开销。
+    """
+
+    def __init__(self):
+        self.records = {}   # 模块名 -> [self, cumulative]
+        self._stack = []
+        self._original = None
+        self._thread = None
+
+    def start(self):
+        self._original = builtins.__import__
+        self._thread = _thread.get_ident()
+        builtins.__import__ = self._import
+
+    def stop(self):
+        if builtins.__import__ is self._import:
+            builtins.__import__ = self._original
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original
+        if level or name in sys.modules or _thread.get_ident() != self._thread:
+            return original(name, globals, locals, fromlist, level)
+        stack = self._stack
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record = self.records.setdefault(name, [0.0, 0.0])
+            record[0] += elapsed - nested
+            record[1] += elapsed
+
+    def report(self, limit=None):
+        items = sorted(self.records.items(), key=lambda item: item[1][1], reverse=True)
+        if limit:
+            items = items[:limit]
+        return [{"module": name, "self": round(own, 6), "cumulative": round(total, 6)}
+                for name, (own, total) in items]
+
+
+import_timer = ImportTimer()
+import_timer.start()
+
+import os
 import logging
-import ast
 import types
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from logging.handlers import RotatingFileHandler  # 新增
+import re
+import marshal
+import threading
+import heapq
+import itertools
+import bisect
+import queue
+import atexit
+import gc
+import collections
+from logging.handlers import RotatingFileHandler, QueueHandler  # 新增
+
+
+# 日志队列容量；队列满时的策略: drop 直接丢弃并计数，block 最多等待 LOG_QUEUE_BLOCK_SECONDS 后再丢弃
+LOG_QUEUE_SIZE = int(os.environ.get("RUNNER_LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_POLICY = os.environ.get("RUNNER_LOG_QUEUE_POLICY", "drop")
+LOG_QUEUE_BLOCK_SECONDS = 1.0
+# 写日志线程每批最多处理的记录数，每批只 flush 一次
+LOG_BATCH_SIZE = 256
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """批量写入时跳过逐条 flush，由 LogWriterThread 在整批写完后统一 flush。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batching = False
+
+    def flush(self):
+        if not self.batching:
+            super().flush()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """把日志记录放进有界队列后立即返回，工作线程不再持有文件锁或做文件 I/O。"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            if LOG_QUEUE_POLICY == "block":
+                self.queue.put(record, timeout=LOG_QUEUE_BLOCK_SECONDS)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogWriterThread:
+    """
+    后台写日志线程：从队列中成批取出记录交给文件处理器，整批写完后 flush 一次。
+    文件切换（RotatingFileHandler 的 doRollover）也只会发生在这个线程上。
+    """
+    _STOP = object()
+
+    def __init__(self, log_queue, handler):
+        self.queue = log_queue
+        self.handler = handler
+        self.thread = threading.Thread(target=self._run, name="runner-log-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.queue.put(self._STOP)
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        handler = self.handler
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            handler.batching = True
+            stop = False
+            try:
+                for record in batch:
+                    if record is self._STOP:
+                        stop = True
+                        continue
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            finally:
+                handler.batching = False
+                handler.flush()
+            if stop:
+                return
+
+
+# 配置日志：级别为ERROR，写入文件，满1G切换，最多保留3个文件
+# 所有线程（包括插件）只把记录放入队列，由 LogWriterThread 批量写文件
+log_file = "python_runner.log"
+log_file_handler = BatchedRotatingFileHandler(log_file, maxBytes=1024*1024*1024, backupCount=3)
+log_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_queue_handler = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # 完整格式由文件处理器负责
+logging.basicConfig(
+    level=logging.ERROR,
+    handlers=[log_queue_handler]
+)
+log_writer = LogWriterThread(log_queue_handler.queue, log_file_handler)
+log_writer.start()
+atexit.register(lambda: log_writer.stop())
+
+
+def _restart_log_writer_in_child():
+    """fork 出的子进程没有写日志线程，换一个新队列并重新启动它。"""
+    global log_writer
+    log_queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    log_writer = LogWriterThread(log_queue_handler.queue, log_file_handler)
+    log_writer.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_log_writer_in_child)
+
+# ---- 运行指标 ----
+# OpenMetrics 文本文件路径（可供 node_exporter textfile collector 采集），设置为空字符串可关闭；
+# 分片运行时各上下文写各自的文件，分片号插在扩展名前（如 python_runner.shard2.prom）
+METRICS_TEXTFILE = os.environ.get("RUNNER_METRICS_TEXTFILE", "python_runner.prom")
+# 文本文件最短写入间隔（秒）
+METRICS_TEXTFILE_INTERVAL = 10
+# 文本文件中只输出累计耗时最高的若干个模块，避免 2 万个模块撑大文件
+METRICS_TEXTFILE_TOP_MODULES = 50
+
+
+class Histogram:
+    """固定桶的延迟直方图（秒），只保存各桶计数、总数和总和。"""
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """按桶上界估算分位数。"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class MetricsRegistry:
+    """
+    进程内指标表：计数器、仪表值、各阶段耗时直方图，以及每个模块的 execute() 耗时直方图。
+    snapshot_json() 通过 polyglot 导出为 runnerMetrics，供 PythonRunnerTask 轮询。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.phases = {}    # 阶段名 -> Histogram
+        self.modules = {}   # 模块名 -> Histogram
+        self.last_textfile_write = 0.0
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def collect_gauges(self):
+        gauges = dict(self.gauges)
+        gauges["shared_code_unique"] = len(shared_code.codes)
+        return gauges
+
+    def observe_phase(self, phase, seconds):
+        with self.lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_module(self, module_name, seconds):
+        with self.lock:
+            histogram = self.modules.get(module_name)
+            if histogram is None:
+                histogram = self.modules[module_name] = Histogram()
+            histogram.observe(seconds)
+
+    def forget_module(self, module_name):
+        with self.lock:
+            self.modules.pop(module_name, None)
+
+    def collect_counters(self):
+        """合并各子系统自带的计数器。"""
+        counters = dict(self.counters)
+        counters.update({f"prescreen_{k}": v for k, v in prescreen_stats.items()})
+        counters["log_records_dropped"] = log_queue_handler.dropped
+        counters["dedup_hits"] = shared_code.hits
+        counters["dedup_misses"] = shared_code.misses
+        counters["gc_pause_seconds"] = round(gc_policy.pause_total, 6)
+        if code_cache is not None:
+            counters.update({f"code_cache_{k}": v for k, v in code_cache.stats().items()})
+        return counters
+
+    def _top_histograms(self, limit):
+        """累计耗时最高的 limit 个模块的 (模块名, Histogram)，调用方持有 self.lock。"""
+        return heapq.nlargest(limit, self.modules.items(), key=lambda item: item[1].sum)
+
+    def top_modules(self, limit):
+        with self.lock:
+            return [(name, h.snapshot()) for name, h in self._top_histograms(limit)]
+
+    def snapshot(self, top=20):
+        with self.lock:
+            phases = {name: h.snapshot() for name, h in self.phases.items()}
+        snapshot = {
+            "counters": self.collect_counters(),
+            "gauges": self.collect_gauges(),
+            "phases": phases,
+            "slowest_modules": dict(self.top_modules(top)),
+        }
+        if memory_profiler.every > 0:
+            snapshot["memory_growth"] = memory_profiler.report(top)
+        return snapshot
+
+    def snapshot_json(self):
+        import json
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def render_openmetrics(self):
+        lines = []
+        for name, value in sorted(self.collect_counters().items()):
+            lines.append(f"# TYPE runner_{name} counter")
+            lines.append(f"runner_{name}_total {value}")
+        for name, value in sorted(self.collect_gauges().items()):
+            lines.append(f"# TYPE runner_{name} gauge")
+            lines.append(f"runner_{name} {value}")
+
+        def histogram_lines(metric, label, histogram):
+            cumulative = 0
+            for bound, n in zip(Histogram.BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{metric}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+            lines.append(f"{metric}_sum{{{label}}} {histogram.sum:.6f}")
+
+        with self.lock:
+            phases = list(self.phases.items())
+            modules = self._top_histograms(METRICS_TEXTFILE_TOP_MODULES)
+        lines.append("# TYPE runner_phase_seconds histogram")
+        for phase, histogram in sorted(phases):
+            histogram_lines("runner_phase_seconds", f'phase="{phase}"', histogram)
+        lines.append("# TYPE runner_module_execute_seconds histogram")
+        for module_name, histogram in modules:
+            escaped = module_name.replace("\\", "\\\\").replace('"', '\\"')
+            histogram_lines("runner_module_execute_seconds", f'module="{escaped}"', histogram)
+        if memory_profiler.every > 0:
+            lines.append("# TYPE runner_module_retained_growth_bytes gauge")
+            for item in memory_profiler.report(METRICS_TEXTFILE_TOP_MODULES):
+                escaped = item["module"].replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'runner_module_retained_growth_bytes{{module="{escaped}",shared_files="{item["shared_files"]}"}} '
+                             f'{item["recent_bytes"]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def maybe_write_textfile(self, path=None):
+        """
+        按 METRICS_TEXTFILE_INTERVAL 限频，原子地写出 OpenMetrics 文本文件。
+        同一 JVM 中的各 PythonPool 上下文共用一个 pid：目标文件按分片区分，临时文件名再加上本注册表的标识，互不覆盖。
+        """
+        path = path or METRICS_TEXTFILE
+        now = time.monotonic()
+        if not path or now - self.last_textfile_write < METRICS_TEXTFILE_INTERVAL:
+            return
+        self.last_textfile_write = now
+        shard_id, shard_count = current_shard
+        if shard_count > 1:
+            root, ext = os.path.splitext(path)
+            path = f"{root}.shard{shard_id}{ext}"
+        tmp_path = f"{path}.{os.getpid()}.{id(self):x}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render_openmetrics())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error("写入指标文件 %s 出错: %s", path, e)
+
+
+metrics = MetricsRegistry()
+
+
+def runner_metrics():
+    """返回当前指标快照（JSON 字符串），供宿主通过 polyglot 绑定 runnerMetrics 调用。"""
+    return metrics.snapshot_json()
+
+
+try:
+    import polyglot
+    polyglot.export_value("runnerMetrics", runner_metrics)
+except Exception as e:
+    logging.info("未导出 runnerMetrics 绑定: %s", e)
+
+
+# 默认禁止的模块：按点分段精确匹配，"os" 禁止 os 和 os.path，但不影响 osmnx
+DISALLOWED_MODULE_PREFIXES = (
+    "os", "sys", "importlib", "subprocess", "socket", "shutil", "platform",
+    "pathlib", "urllib", "requests", "threading", "multiprocessing", "ctypes",
+    "sqlite3", "http", "builtins", "marshal", "inspect", "pkgutil", "psutil", "glob"
+)
+
+# 默认禁止的危险函数
+DISALLOWED_FUNCTIONS = {'eval', 'exec', '__import__', 'open', 'compile', 'globals', 'locals'}
+
+# 模块策略文件（JSON），形如 {"deny": [...], "allow": [...], "functions": [...]}，
+# 缺省的键取上面的默认值；为空时只使用默认策略。文件修改后下一个周期生效
+MODULE_POLICY_FILE = os.environ.get("RUNNER_MODULE_POLICY", "")
+
+
+class ModulePolicy:
+    """
+    编译后的模块导入策略。deny 与 allow 中的点分模块名编入一棵按段索引的树，
+    查找时沿模块名逐段下降，以最深的命中项为准：allow 中更具体的项可以放行被禁止包下的子模块
+    （如 deny "xml" + allow "xml.etree"），同一名字同时出现在两边时以 deny 为准。
+    耗时只与模块名的段数有关，与规则条数无关。
+    实例不可变、可哈希，version 可作为下游缓存键的一部分。
+    """
+    __slots__ = ("deny", "allow", "functions", "_version", "_trie")
+
+    def __init__(self, deny, allow=(), functions=DISALLOWED_FUNCTIONS):
+        self.deny = frozenset(deny)
+        self.allow = frozenset(allow)
+        self.functions = frozenset(functions)
+        # 段 -> [判定（True 放行 / False 禁止 / None 未设置）, 子节点]
+        trie = {}
+        for verdict, names in ((True, self.allow), (False, self.deny)):
+            for name in names:
+                node = trie
+                *parents, last = name.split(".")
+                for part in parents:
+                    node = node.setdefault(part, [None, {}])[1]
+                node.setdefault(last, [None, {}])[0] = verdict
+        self._trie = trie
+        self._version = None
+
+    @property
+    def version(self):
+        """策略内容的稳定摘要，跨进程一致。"""
+        if self._version is None:
+            import hashlib
+            canonical = (sorted(self.deny), sorted(self.allow), sorted(self.functions))
+            self._version = hashlib.sha256(repr(canonical).encode('utf-8')).hexdigest()[:16]
+        return self._version
+
+    @classmethod
+    def load(cls, path):
+        import json
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get("deny", DISALLOWED_MODULE_PREFIXES), data.get("allow", ()),
+                   data.get("functions", DISALLOWED_FUNCTIONS))
+
+    def is_disallowed(self, name):
+        node = self._trie
+        verdict = None
+        for part in name.split("."):
+            entry = node.get(part)
+            if entry is None:
+                break
+            if entry[0] is not None:
+                verdict = entry[0]
+            node = entry[1]
+        return verdict is False
+
+    def denied_roots(self):
+        """所有禁止项的首段，供预筛正则使用。"""
+        return sorted({name.split(".", 1)[0] for name in self.deny})
+
+    def __eq__(self, other):
+        return isinstance(other, ModulePolicy) and self.version == other.version
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __repr__(self):
+        return f"ModulePolicy(version={self.version}, deny={len(self.deny)}, allow={len(self.allow)})"
+
+
+module_policy = ModulePolicy(DISALLOWED_MODULE_PREFIXES)
+# 已加载策略文件的 mtime_ns，用于发现文件变化
+_module_policy_mtime = None
+
+
+def set_module_policy(policy):
+    """
+    切换模块策略。预筛正则和源码内容键的盐值都依赖策略，一并作废；
+    再清空所有目录快照，让已加载的模块在下一个周期按新策略重新清洗加载。
+    """
+    global module_policy, _source_key_salt, _prescreen_pattern
+    if policy == module_policy:
+        return False
+    module_policy = policy
+    _source_key_salt = None
+    _prescreen_pattern = None
+    for watcher in _watchers.values():
+        watcher.scanner.reset()
+        if hasattr(watcher, "needs_full_scan"):
+            watcher.needs_full_scan = True
+    logging.error("模块策略已切换为 %r，所有模块将重新加载", policy)
+    return True
+
+
+def refresh_module_policy():
+    """检查 MODULE_POLICY_FILE 是否变化，变化时重新加载；文件有误时保留当前策略。"""
+    global _module_policy_mtime
+    if not MODULE_POLICY_FILE:
+        return False
+    try:
+        mtime = os.stat(MODULE_POLICY_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime == _module_policy_mtime:
+        return False
+    _module_policy_mtime = mtime
+    if mtime is None:
+        logging.error("模块策略文件 %s 不存在，使用默认策略", MODULE_POLICY_FILE)
+        return set_module_policy(ModulePolicy(DISALLOWED_MODULE_PREFIXES))
+    try:
+        policy = ModulePolicy.load(MODULE_POLICY_FILE)
+    except Exception as e:
+        logging.error("加载模块策略文件 %s 出错，保留当前策略: %s", MODULE_POLICY_FILE, e)
+        return False
+    return set_module_policy(policy)
+
+
+def is_disallowed_module(name):
+    return module_policy.is_disallowed(name)
+
+# ast 只在需要清洗或解析的源码上才用到，SecuritySanitizer 在首次使用时才定义，避免启动时导入 ast
+_sanitizer_class = None
+
+def new_security_sanitizer():
+    global _sanitizer_class
+    if _sanitizer_class is None:
+        import ast
+
+        class SecuritySanitizer(ast.NodeTransformer):
+            def __init__(self):
+                super().__init__()
+                self.imports = set()  # 保留下来的导入所涉及的模块名，供依赖图使用
+
+            def visit_Import(self, node):
+                for alias in node.names:
+                    if is_disallowed_module(alias.name):
+                        logging.warning(f"移除不允许的导入: import {alias.name}")
+                        return None
+                self.imports.update(alias.name for alias in node.names)
+                return node
+
+            def visit_ImportFrom(self, node):
+                full_module = node.module or ""
+                if node.level > 0 or is_disallowed_module(full_module):
+                    msg = f"移除不允许的导入: from {'.'*node.level}{full_module}" if node.level > 0 else f"from {full_module}"
+                    logging.warning(msg)
+                    return None
+                # from a import b 中的 b 可能是子模块，按 a.b 再查一次策略，否则点分的禁止项（如 xml.dom）可被绕过
+                submodules = [f"{full_module}.{alias.name}" for alias in node.names if alias.name != "*"]
+                for name in submodules:
+                    if is_disallowed_module(name):
+                        logging.warning(f"移除不允许的导入: from {full_module} import {name.rsplit('.', 1)[1]}")
+                        return None
+                # 解析不到文件的候选名依赖图会忽略
+                self.imports.add(full_module)
+                self.imports.update(submodules)
+                return node
+
+            def visit_Call(self, node):
+                if isinstance(node.func, ast.Name) and node.func.id in module_policy.functions:
+                    logging.warning(f"移除不允许的函数调用: {node.func.id}")
+                    return ast.Expr(value=ast.Constant(value=None))  # 替换为无害表达式
+                return self.generic_visit(node)
+
+        _sanitizer_class = SecuritySanitizer
+    return _sanitizer_class()
+
+
+# 清洗规则的修订号：修改 SecuritySanitizer 的行为时必须递增，使磁盘缓存失效
+SANITIZER_POLICY_REVISION = 6
+
+def sanitizer_policy_version():
+    return f"{SANITIZER_POLICY_REVISION}-{module_policy.version}"
+
+
+def interpreter_version():
+    impl = sys.implementation
+    return f"{impl.name}-{impl.cache_tag}-{sys.version}-marshal{marshal.version}"
+
+
+# 源码内容键的盐值，清洗策略变化后需与 _prescreen_pattern 一起置为 None 重新计算
+_source_key_salt = None
+
+def source_key(source_bytes):
+    """源码内容键：同样的源码在同样的清洗策略和解释器下得到同样的代码对象。"""
+    global _source_key_salt
+    if _source_key_salt is None:
+        _source_key_salt = f"{sanitizer_policy_version()}|{interpreter_version()}".encode('utf-8')
+    import hashlib
+    h = hashlib.sha256(source_bytes)
+    h.update(b"\0")
+    h.update(_source_key_salt)
+    return h.hexdigest()
+
+
+# 清洗预筛统计：clean 为直接编译的文件数，full 为走完整 AST 清洗的文件数
+prescreen_stats = {"clean": 0, "full": 0}
+_prescreen_pattern = None
+
+def build_prescreen_pattern():
+    """
+    匹配所有可能被 SecuritySanitizer 改写的源码片段：
+    禁止模块的首段、禁止的函数名、相对导入，均按完整标识符匹配。
+    只会多报不会漏报（如被 allow 放行的子模块），多报的文件走完整清洗即可。
+    """
+    alternatives = [rf"\bfrom[\s\\]*\."]
+    for names in (module_policy.denied_roots(), sorted(module_policy.functions)):
+        if names:
+            alternatives.append(rf"\b(?:{'|'.join(re.escape(n) for n in names)})\b")
+    return re.compile("|".join(alternatives), re.ASCII)
+
+
+def needs_sanitizing(source_code):
+    global _prescreen_pattern
+    if _prescreen_pattern is None:
+        _prescreen_pattern = build_prescreen_pattern()
+    if not source_code.isascii():
+        # 解析器会对标识符做 NFKC 归一化（如全角 ｏｓ），按归一化后的文本判断
+        import unicodedata
+        source_code = unicodedata.normalize("NFKC", source_code)
+    return _prescreen_pattern.search(source_code) is not None
+
+
+# 插件可在模块顶层声明的调度元数据，清洗时从 AST 静态读取，不执行模块：
+#   INTERVAL  两次执行的最小间隔（秒），默认 0 即每轮都执行
+#   PRIORITY  同一轮内的执行顺序，数值越大越先执行，默认 0
+#   TIMEOUT   本模块 execute() 的执行期限（秒），默认 MODULE_TIMEOUT_SECONDS
+PLUGIN_METADATA_NAMES = ("INTERVAL", "PRIORITY", "TIMEOUT")
+_metadata_hint = re.compile(r"^(?:INTERVAL|PRIORITY|TIMEOUT)\s*[:=]", re.M)
+
+
+def _metadata_number(value):
+    """元数据取值转为有限的非负数；不是数字常量、超出浮点范围、非有限或为负时返回 None。"""
+    import math
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        finite = math.isfinite(float(value))
+    except OverflowError:
+        return None
+    return value if finite and value >= 0 else None
+
+
+def extract_plugin_metadata(tree, file_path):
+    """
+    静态读取模块顶层的调度元数据。取值有误的项记录警告后忽略，按默认值处理，不影响模块加载；
+    INTERVAL 与 TIMEOUT 必须为正数。
+    """
+    import ast
+    metadata = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target, value = node.targets[0], node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            target, value = node.target, node.value
+        else:
+            continue
+        if not isinstance(target, ast.Name) or target.id not in PLUGIN_METADATA_NAMES:
+            continue
+        try:
+            number = _metadata_number(ast.literal_eval(value))
+        except (ValueError, TypeError, SyntaxError, RecursionError, MemoryError):
+            number = None
+        if number is None or (number == 0 and target.id != "PRIORITY"):
+            logging.warning("模块 %s 的 %s 不是有效的数字常量，使用默认值", file_path, target.id)
+            continue
+        metadata[target.id] = number
+    return metadata
+
+
+def collect_imports(tree, package=""):
+    """
+    返回 AST 中所有 import 语句涉及的模块名集合（含 from a import b 的 a.b 候选）。
+    相对导入按 package 解析，没有 package 时忽略。
+    """
+    import ast
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parent = package.rsplit(".", node.level - 1)[0] if node.level > 1 else package
+                if not parent:
+                    continue
+                base = f"{parent}.{base}" if base else parent
+            imports.add(base)
+            imports.update(f"{base}.{alias.name}" for alias in node.names if alias.name != "*")
+    return imports
+
+
+def compile_sanitized(source_code, file_path):
+    """返回 (清洗后的代码对象, 调度元数据)；元数据的 imports 为导入的模块名。"""
+    code, metadata, sanitize_seconds, compile_seconds = _sanitize_and_compile(source_code, file_path)
+    metrics.observe_phase("sanitize", sanitize_seconds)
+    metrics.observe_phase("compile", compile_seconds)
+    return code, metadata
+
+
+def _sanitize_and_compile(source_code, file_path):
+    """compile_sanitized 的主体，另外返回清洗和编译耗时；不访问任何锁，可在 fork 出的编译进程中运行。"""
+    import ast
+    # 预筛证明没有任何可改写的节点时，清洗结果与原始 AST 相同，直接编译源码
+    start = time.perf_counter()
+    if not needs_sanitizing(source_code):
+        prescreen_stats["clean"] += 1
+        metadata = {}
+        imports = ()
+        tree = source_code
+        # 没有 import 语句也没有元数据声明的源码不必构建 AST；需要时解析一次，直接从 AST 编译
+        if "import" in source_code or _metadata_hint.search(source_code):
+            tree = ast.parse(source_code)
+            metadata = extract_plugin_metadata(tree, file_path)
+            imports = collect_imports(tree)
+    else:
+        prescreen_stats["full"] += 1
+        tree = ast.parse(source_code)
+        metadata = extract_plugin_metadata(tree, file_path)
+        sanitizer = new_security_sanitizer()
+        tree = sanitizer.visit(tree)
+        tree = ast.fix_missing_locations(tree)
+        imports = sanitizer.imports
+    if imports:
+        metadata["imports"] = tuple(sorted(imports))
+    sanitized = time.perf_counter()
+    code = compile(tree, filename=file_path, mode='exec')
+    return code, metadata, sanitized - start, time.perf_counter() - sanitized
+
+
+def relocate_code(code, file_path):
+    """把缓存中代码对象（及其嵌套函数）的 co_filename 改为当前文件。"""
+    if code.co_filename == file_path:
+        return code
+    consts = tuple(relocate_code(c, file_path) if isinstance(c, types.CodeType) else c
+                   for c in code.co_consts)
+    return code.replace(co_filename=file_path, co_consts=consts)
+
+
+# 磁盘缓存目录，设置为空字符串可关闭缓存
+CODE_CACHE_DIR = os.environ.get("RUNNER_CODE_CACHE_DIR", os.path.join(os.getcwd(), ".runner_code_cache"))
+# 磁盘缓存容量上限，超过后按最近使用时间淘汰
+CODE_CACHE_MAX_BYTES = int(os.environ.get("RUNNER_CODE_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+class CodeCache:
+    """
+    清洗并编译后代码对象及其调度元数据的磁盘缓存（marshal 格式）。
+    键由源码字节、清洗策略版本和解释器版本共同决定，任一变化都会自然失效；
+    条目用临时文件 + os.replace 原子写入，读取时校验魔数和摘要，损坏的条目直接删除。
+    缓存目录必须只由 runner 自己写入：marshal 数据不能来自不可信来源。
+    """
+    MAGIC = b"RNRC2\n"
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".bin")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError as e:
+            self.errors += 1
+            logging.error("读取代码缓存 %s 出错: %s", path, e)
+            return None
+
+        import hashlib
+        header = len(self.MAGIC) + 32
+        payload = data[header:]
+        if (data[:len(self.MAGIC)] != self.MAGIC
+                or data[len(self.MAGIC):header] != hashlib.sha256(payload).digest()):
+            self._discard(path, "校验失败")
+            return None
+        try:
+            compiled = marshal.loads(payload)
+        except Exception as e:
+            self._discard(path, e)
+            return None
+        if (not isinstance(compiled, tuple) or len(compiled) != 2
+                or not isinstance(compiled[0], types.CodeType) or not isinstance(compiled[1], dict)):
+            self._discard(path, "内容不是 (代码对象, 元数据)")
+            return None
+
+        self.hits += 1
+        try:
+            os.utime(path)  # 记录最近使用时间，供淘汰使用
+        except OSError:
+            pass
+        return compiled
+
+    def put(self, key, compiled):
+        path = self._path(key)
+        import hashlib
+        payload = marshal.dumps(compiled)
+        data = self.MAGIC + hashlib.sha256(payload).digest() + payload
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.errors += 1
+            logging.error("写入代码缓存 %s 出错: %s", path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.writes += 1
+        if self.total_bytes is None:
+            self.total_bytes = self._disk_usage()
+        else:
+            self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def _discard(self, path, reason):
+        self.errors += 1
+        logging.warning("丢弃损坏的代码缓存 %s: %s", path, reason)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                with os.scandir(shard.path) as it:
+                    for entry in it:
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            except OSError:
+                continue
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """按最近使用时间淘汰，直到总大小降到上限的 90% 以下。"""
+        entries = self._entries()
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.total_bytes = total
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+code_cache = CodeCache(CODE_CACHE_DIR, CODE_CACHE_MAX_BYTES) if CODE_CACHE_DIR else None
+
+
+class SharedCodeRegistry:
+    """
+    按源码内容去重的内存代码对象表。
+    内容相同的插件文件（如 a.sh 复制出的 2 万份 a.py）共享同一个代码对象，
+    每个文件仍在自己的模块命名空间中执行；共享代码的 co_filename 指向第一个加载它的文件。
+    """
+
+    def __init__(self):
+        self.codes = {}       # key -> [(code, metadata), 引用计数]
+        self.file_keys = {}   # file_path -> key
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.codes.get(key)
+        return entry[0] if entry is not None else None
+
+    def acquire(self, file_path, key, compiled):
+        """登记 file_path 使用 key 对应的 (代码对象, 元数据)，返回实际共享的那一份。"""
+        self.release(file_path)
+        entry = self.codes.get(key)
+        if entry is None:
+            entry = self.codes[key] = [compiled, 0]
+        entry[1] += 1
+        self.file_keys[file_path] = key
+        return entry[0]
+
+    def release(self, file_path):
+        key = self.file_keys.pop(file_path, None)
+        if key is None:
+            return
+        entry = self.codes[key]
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.codes[key]
+
+    def owners(self):
+        """共享代码对象的 co_filename -> 内容键，用于把执行帧归到内容相同的那一组文件。"""
+        return {entry[0][0].co_filename: key for key, entry in self.codes.items()}
+
+    def files_by_key(self):
+        """内容键 -> 共享它的文件列表。"""
+        groups = {}
+        for file_path, key in self.file_keys.items():
+            groups.setdefault(key, []).append(file_path)
+        return groups
+
+    def stats(self):
+        return {
+            "dedup_hits": self.hits,
+            "dedup_misses": self.misses,
+            "unique_codes": len(self.codes),
+            "files": len(self.file_keys),
+        }
+
+
+shared_code = SharedCodeRegistry()
+
+
+# 批量加载时，需要编译的文件数达到该值才使用进程池，否则在本进程内编译
+PARALLEL_COMPILE_MIN_FILES = int(os.environ.get("RUNNER_PARALLEL_COMPILE_MIN_FILES", "64"))
+PARALLEL_COMPILE_WORKERS = int(os.environ.get("RUNNER_PARALLEL_COMPILE_WORKERS", "0")) or (os.cpu_count() or 4)
+
+
+def _compile_worker(item):
+    """
+    进程池任务：清洗并编译一份源码，以 marshal 字节返回，便于跨进程传输。
+    fork 时其他线程可能正持有 metrics.lock 等锁，这里不记录指标，耗时随结果交回父进程记录。
+    """
+    file_path, source_code = item
+    full_before = prescreen_stats["full"]
+    try:
+        code, metadata, sanitize_seconds, compile_seconds = _sanitize_and_compile(source_code, file_path)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", False, None
+    return (marshal.dumps((code, metadata)), None, prescreen_stats["full"] != full_before,
+            (sanitize_seconds, compile_seconds))
+
+
+def _fork_context():
+    import multiprocessing
+    if not hasattr(os, "fork") or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    # runner.py 由宿主直接 eval，所在命名空间未必能按模块名找到；
+    # 把任务函数挂到一个已注册的模块上，fork 出的子进程按引用反序列化即可找到它
+    if _compile_worker.__module__ != "_runner_workers":
+        workers_module = sys.modules.setdefault("_runner_workers", types.ModuleType("_runner_workers"))
+        workers_module._compile_worker = _compile_worker
+        _compile_worker.__module__ = "_runner_workers"
+    return multiprocessing.get_context("fork")
+
+
+def compile_sources(items):
+    """
+    编译 [(file_path, source_code), ...]，返回与之对应的 [(代码对象, 元数据) 或异常, ...]。
+    数量较多时分发到 fork 出的进程池；多进程不可用（如 GraalPy）或进程池出错时退回本进程编译。
+    """
+    results = [None] * len(items)
+    done = 0
+    if len(items) >= PARALLEL_COMPILE_MIN_FILES and PARALLEL_COMPILE_WORKERS > 1:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            mp_context = _fork_context()
+            if mp_context is not None:
+                pool_start = time.perf_counter()
+                workers = min(PARALLEL_COMPILE_WORKERS, len(items))
+                chunksize = max(1, len(items) // (workers * 4))
+                with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+                    for payload, error, full, timings in pool.map(_compile_worker, items, chunksize=chunksize):
+                        prescreen_stats["full" if full else "clean"] += 1
+                        results[done] = marshal.loads(payload) if payload is not None else RuntimeError(error)
+                        done += 1
+                        if timings is not None:
+                            metrics.observe_phase("sanitize", timings[0])
+                            metrics.observe_phase("compile", timings[1])
+                metrics.observe_phase("compile_pool", time.perf_counter() - pool_start)
+        except Exception as e:
+            logging.error("进程池编译失败，改为本进程编译: %s", e)
+
+    for i in range(done, len(items)):
+        file_path, source_code = items[i]
+        try:
+            results[i] = compile_sanitized(source_code, file_path)
+        except Exception as e:
+            results[i] = e
+    return results
+
+
+def _new_module(file_path, code, metadata):
+    module = types.ModuleType(f"mod_{os.path.basename(file_path)[:-3]}")
+    module.__file__ = file_path
+    module.cancel_token = CancellationToken(metadata.get("TIMEOUT"))
+    module.java_bridge = java_bridge
+    module.http_client = http_client
+    exec(code, module.__dict__)
+    return module
+
+
+# 各插件文件的调度元数据: file_path -> {"INTERVAL": ..., "PRIORITY": ..., "TIMEOUT": ..., "imports": (...)}
+plugin_metadata = {}
+# 各插件文件导入的模块名: file_path -> (...)。编译成功即记录，模块代码执行失败（如辅助模块导入时出错）也保留，
+# 依赖图据此在辅助模块修复后重试这些插件
+plugin_imports = {}
+
+
+class NamespaceGuard:
+    """
+    模块命名空间的单次执行隔离。加载完成后建立一次基线，每次 execute() 结束后：
+    - 删除执行期间新增的全局名：键集合与基线相同时只是一次 C 层比较，不分配任何集合；
+    - 插件用 ISOLATED_GLOBALS = ("name", ...) 声明的可变全局（计数器、缓存等）恢复为加载时快照的副本，
+      从而连对已有全局的修改也不会带到下一次执行；未声明的已有全局保持原有行为，不做恢复。
+    """
+    __slots__ = ("namespace", "baseline_keys", "isolated")
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        import copy
+        names = namespace.get("ISOLATED_GLOBALS") or ()
+        self.isolated = {name: copy.deepcopy(namespace[name]) for name in names if name in namespace}
+        self.baseline_keys = frozenset(namespace)
+
+    def restore(self):
+        namespace = self.namespace
+        if namespace.keys() != self.baseline_keys:
+            for key in namespace.keys() - self.baseline_keys:
+                namespace.pop(key, None)
+        if self.isolated:
+            import copy
+            for name, value in self.isolated.items():
+                namespace[name] = copy.deepcopy(value)
+
+
+# 各插件文件的命名空间隔离: file_path -> NamespaceGuard
+namespace_guards = {}
+
+
+def namespace_guard_of(module):
+    """
+    返回属于 module 这个实例的 NamespaceGuard，在执行开始时取得。
+    文件被重新加载或驱逐后重新载入时 namespace_guards 中已是新实例的基线，仍在执行的旧实例返回 None，
+    结束时不能去恢复新实例的命名空间。
+    """
+    guard = namespace_guards.get(getattr(module, "__file__", None))
+    if guard is None or guard.namespace is not module.__dict__:
+        return None
+    return guard
+
+
+def load_and_sanitize_modules(file_paths):
+    """
+    批量加载并清洗模块，返回 {file_path: module 或 None}。
+    先按内容键查内存共享代码和磁盘缓存，剩余的不同内容只编译一次（可并行），最后逐个执行模块代码。
+    """
+    file_keys = {}
+    codes = {}       # key -> (代码对象, 元数据) 或异常
+    to_compile = {}  # key -> (file_path, source_code)
+    results = {}
+
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb') as f:
+                source_bytes = f.read()
+            key = source_key(source_bytes)
+            file_keys[file_path] = key
+            if key in codes or key in to_compile:
+                shared_code.hits += 1
+                continue
+            compiled = shared_code.get(key)
+            if compiled is not None:
+                shared_code.hits += 1
+                codes[key] = compiled
+                continue
+            shared_code.misses += 1
+            compiled = code_cache.get(key) if code_cache is not None else None
+            if compiled is not None:
+                codes[key] = (relocate_code(compiled[0], file_path), compiled[1])
+            else:
+                to_compile[key] = (file_path, source_bytes.decode('utf-8'))
+        except Exception as e:
+            metrics.inc("load_failures")
+            logging.error("加载模块 %s 时出错: %s", file_path, e)
+            results[file_path] = None
+
+    if to_compile:
+        keys = list(to_compile)
+        for key, compiled in zip(keys, compile_sources([to_compile[k] for k in keys])):
+            codes[key] = compiled
+            if code_cache is not None and isinstance(compiled, tuple):
+                code_cache.put(key, compiled)
+
+    for file_path, key in file_keys.items():
+        compiled = codes[key]
+        if isinstance(compiled, tuple):
+            plugin_imports[file_path] = compiled[1].get("imports", ())
+        else:
+            plugin_imports.pop(file_path, None)
+        try:
+            if isinstance(compiled, Exception):
+                raise compiled
+            code, metadata = shared_code.acquire(file_path, key, compiled)
+            module = _new_module(file_path, code, metadata)
+            namespace_guards[file_path] = NamespaceGuard(module.__dict__)
+            plugin_metadata[file_path] = metadata
+            results[file_path] = module
+            logging.info("模块 %s 加载并清洗成功", file_path)
+        except Exception as e:
+            plugin_metadata.pop(file_path, None)
+            namespace_guards.pop(file_path, None)
+            shared_code.release(file_path)
+            metrics.inc("load_failures")
+            logging.error("加载模块 %s 时出错: %s", file_path, e)
+            results[file_path] = None
+    return results
+
+
+def load_and_sanitize_module(file_path):
+    return load_and_sanitize_modules([file_path])[file_path]
+
+
+# 缓存模块加载状态
+loaded_modules = {}
+module_mtime_cache = {}
+
+# 加载失败的文件即使未被修改也会重试，间隔从 LOAD_RETRY_BASE_SECONDS 起每次翻倍，不超过 LOAD_RETRY_MAX_SECONDS，
+# 缺失的依赖稍后出现等暂时性失败可以自行恢复
+LOAD_RETRY_BASE_SECONDS = float(os.environ.get("RUNNER_LOAD_RETRY_BASE", "1"))
+LOAD_RETRY_MAX_SECONDS = float(os.environ.get("RUNNER_LOAD_RETRY_MAX", "60"))
+# 加载失败的文件: file_path -> (连续失败次数, 下次重试的 time.monotonic() 时间)
+failed_loads = {}
+
+# 全局线程池，首次执行模块时才创建，不计入启动耗时
+cpu_count = os.cpu_count() or 4
+executor = None
+
+def get_executor():
+    global executor
+    if executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=cpu_count)
+    return executor
+
+
+def retire_executor():
+    """
+    滞留模块会一直占用所在的线程池线程，线程池大小固定，不替换就会越来越少可用线程。
+    有模块滞留时换一个新的线程池；旧线程池不再接收任务，其线程在滞留模块结束后自行退出。
+    """
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False)
+        executor = None
+        metrics.inc("executor_retirements")
+
+# 单个模块 execute() 的执行期限（秒），超时后置位该模块的取消标记
+MODULE_TIMEOUT_SECONDS = float(os.environ.get("RUNNER_MODULE_TIMEOUT", "5"))
+# 每轮执行阶段的总期限（秒），从扫描和加载结束、开始执行模块时算起，到期后本轮立即返回，未完成的模块记为滞留；
+# 冷启动加载大目录的耗时不占用执行预算
+CYCLE_TIMEOUT_SECONDS = float(os.environ.get("RUNNER_CYCLE_TIMEOUT", "10"))
+
+
+class ModuleCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    """
+    协作式取消标记，加载时注入到插件命名空间的 cancel_token。
+    耗时较长的插件应在循环中检查 cancel_token.cancelled 或调用 cancel_token.check()。
+    """
+    __slots__ = ("cancelled", "deadline", "timeout")
+
+    def __init__(self, timeout=None):
+        self.cancelled = False
+        self.deadline = None
+        self.timeout = timeout or MODULE_TIMEOUT_SECONDS
+
+    def reset(self):
+        self.cancelled = False
+        self.deadline = time.monotonic() + self.timeout
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise ModuleCancelled("模块执行已被取消")
+
+
+class Watchdog:
+    """后台线程，定期检查正在执行的模块，超过期限的置位取消标记。"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.running = {}  # token -> module_name
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def watch(self, token, module_name):
+        with self.lock:
+            self.running[token] = module_name
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="runner-watchdog", daemon=True)
+                self.thread.start()
+
+    def unwatch(self, token):
+        with self.lock:
+            self.running.pop(token, None)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self.lock:
+                overdue = [(t, n) for t, n in self.running.items()
+                           if not t.cancelled and t.deadline is not None and now > t.deadline]
+            for token, module_name in overdue:
+                token.cancel()
+                logging.error("模块 '%s' 执行超过 %.1f 秒，已发出取消请求", module_name, token.timeout)
+
+
+watchdog = Watchdog()
+# 上一轮超时仍在线程池中运行的模块: module -> future，下一轮跳过它们
+in_flight_modules = {}
+
+import resource
+
+def get_memory_usage_mb():
+    """进程峰值常驻内存（MB）。ru_maxrss 在 Linux 上以 KB 为单位，在 macOS 上以字节为单位。"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def get_rss_bytes():
+    """当前常驻内存（字节）。优先读 /proc/self/statm，不可用时退回 ru_maxrss（峰值）。"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# 第 0 代阈值：每次只有几十个对象的周期，默认的 700 会让年轻代回收过于频繁
+GC_THRESHOLDS = tuple(int(x) for x in os.environ.get("RUNNER_GC_THRESHOLDS", "10000,20,20").split(","))
+# 上次完整回收以来常驻内存增长超过该值时做一次完整回收
+GC_RSS_GROWTH_MB = float(os.environ.get("RUNNER_GC_RSS_GROWTH_MB", "64"))
+# 上次完整回收以来第 0 代回收次数超过该值（即分配了大量容器对象）时做一次完整回收
+GC_YOUNG_COLLECTIONS = int(os.environ.get("RUNNER_GC_YOUNG_COLLECTIONS", "500"))
+# 无论计数器如何，至少每隔这么久做一次完整回收
+GC_MAX_INTERVAL_SECONDS = float(os.environ.get("RUNNER_GC_MAX_INTERVAL", "600"))
+# 已冻结的模块被删除/替换累计到这么多个后，解冻并回收一次，释放它们占用的内存
+GC_UNFREEZE_AFTER_RELEASES = int(os.environ.get("RUNNER_GC_UNFREEZE_AFTER", "100"))
+
+
+class GcPolicy:
+    """
+    自适应垃圾回收策略，替代每个周期强制 gc.collect()。
+    模块注册表加载完成后先回收再 gc.freeze()，长期存活的模块对象移入永久代，之后的回收不再遍历它们；
+    只有分配量（第 0 代回收次数）或常驻内存增长超过阈值、或距上次完整回收过久时才做完整回收。
+    每次回收（包括解释器自动触发的）的暂停时间通过 gc.callbacks 记录，并入 gc_pause 阶段指标。
+    """
+
+    def __init__(self):
+        self.last_full_time = time.monotonic()
+        self.last_full_rss = get_rss_bytes()
+        self.last_young_collections = self._young_collections()
+        self.pending_releases = 0
+        self.full_collections = 0
+        self.freezes = 0
+        # gc 回调里不能拿 metrics.lock（回收可能发生在持锁的代码里），先记在这里，周期末再转入 metrics
+        self.pauses = collections.deque(maxlen=10000)
+        self.pause_total = 0.0
+        self._pause_start = None
+        self.installed = False
+
+    @staticmethod
+    def _young_collections():
+        return gc.get_stats()[0]["collections"]
+
+    def install(self):
+        if self.installed:
+            return
+        gc.set_threshold(*GC_THRESHOLDS)
+        gc.callbacks.append(self._on_gc)
+        self.installed = True
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._pause_start = time.perf_counter()
+        elif self._pause_start is not None:
+            pause = time.perf_counter() - self._pause_start
+            self._pause_start = None
+            self.pause_total += pause
+            self.pauses.append(pause)
+
+    def after_load(self, loaded, released):
+        """
+        注册表发生变化后调用：先做一次完整回收，避免把加载过程中的垃圾一起冻结，再冻结当前所有对象。
+        released 是本轮被删除或被替换的模块数，它们若已冻结，只能等解冻后才能回收。
+        """
+        self.pending_releases += released
+        if not loaded and self.pending_releases < GC_UNFREEZE_AFTER_RELEASES:
+            return
+        reason = "load"
+        if self.pending_releases >= GC_UNFREEZE_AFTER_RELEASES:
+            gc.unfreeze()
+            self.pending_releases = 0
+            reason = "unfreeze"
+        self.collect(reason)
+        gc.freeze()
+        self.freezes += 1
+
+    def collect(self, reason):
+        gc.collect()
+        self.full_collections += 1
+        self.last_full_time = time.monotonic()
+        self.last_full_rss = get_rss_bytes()
+        self.last_young_collections = self._young_collections()
+        metrics.inc(f"gc_full_collections_{reason}")
+
+    def end_of_cycle(self):
+        """周期末检查计数器，需要时做一次完整回收，并把本周期的回收暂停时间写入指标。"""
+        reason = None
+        if self._young_collections() - self.last_young_collections >= GC_YOUNG_COLLECTIONS:
+            reason = "allocations"
+        elif get_rss_bytes() - self.last_full_rss >= GC_RSS_GROWTH_MB * 1024 * 1024:
+            reason = "rss"
+        elif time.monotonic() - self.last_full_time >= GC_MAX_INTERVAL_SECONDS:
+            reason = "interval"
+        if reason:
+            self.collect(reason)
+
+        pauses = self.pauses
+        while pauses:
+            metrics.observe_phase("gc_pause", pauses.popleft())
+        metrics.set_gauge("gc_frozen_objects", gc.get_freeze_count())
+        metrics.set_gauge("gc_pending_releases", self.pending_releases)
+
+
+gc_policy = GcPolicy()
+gc_policy.install()
+
+
+# 按模块的内存归因：0 关闭；N > 0 时每 N 个周期采样一次，只在采样周期内开启 tracemalloc
+MEMORY_SAMPLE_EVERY = int(os.environ.get("RUNNER_MEMORY_SAMPLE_EVERY", "0"))
+# 每次分配记录的栈深度：越深越能把插件调用的库函数里的分配归到插件上，开销也越大
+MEMORY_TRACE_FRAMES = int(os.environ.get("RUNNER_MEMORY_TRACE_FRAMES", "4"))
+# 连续这么多次采样的保留增长都不少于 MEMORY_LEAK_MIN_BYTES 的模块标记为疑似泄漏
+MEMORY_LEAK_SAMPLES = int(os.environ.get("RUNNER_MEMORY_LEAK_SAMPLES", "3"))
+MEMORY_LEAK_MIN_BYTES = int(os.environ.get("RUNNER_MEMORY_LEAK_MIN_KB", "16")) * 1024
+# 每个模块保留的采样历史条数
+MEMORY_HISTORY = 10
+
+
+class ModuleMemoryStats:
+    __slots__ = ("history", "rising", "total")
+
+    def __init__(self):
+        self.history = collections.deque(maxlen=MEMORY_HISTORY)
+        self.rising = 0     # 连续增长的采样次数
+        self.total = 0      # 所有采样的保留增长之和
+
+
+class MemoryProfiler:
+    """
+    基于 tracemalloc 的按模块内存归因。采样周期在执行阶段前开始跟踪，周期末回收垃圾后取快照，
+    得到本周期内分配且周期结束时仍然存活的内存，按调用栈中最内层的插件代码归属。
+    内容相同的文件共享同一个代码对象（co_filename 为第一个加载它的文件），分配无法区分到单个文件，
+    因此按内容键合并统计，报告中列出共享该代码的文件数和文件名。
+    非采样周期不跟踪，开销只落在 1/MEMORY_SAMPLE_EVERY 的周期上。
+    进程已经在跟踪（如 -X tracemalloc）时不启停跟踪，改为与周期开始时的快照作差。
+    只统计本进程内执行的模块；fork 后端在子进程中执行，不在统计范围内。
+    """
+
+    def __init__(self, every):
+        self.every = every
+        self.cycle = 0
+        self.active = False
+        self.started_tracing = False
+        self.baseline = None
+        self.samples = 0
+        self.modules = {}   # 内容键 -> ModuleMemoryStats
+
+    def begin_cycle(self):
+        if self.every <= 0:
+            return
+        self.cycle += 1
+        if self.cycle % self.every:
+            return
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            self.started_tracing = False
+            self.baseline = self._attribute(tracemalloc.take_snapshot())
+        else:
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+            self.started_tracing = True
+            self.baseline = None
+        self.active = True
+
+    def end_cycle(self):
+        if not self.active:
+            return
+        import tracemalloc
+        self.active = False
+        start = time.perf_counter()
+        # 先回收循环垃圾，只留下真正存活的分配
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+        if self.started_tracing:
+            tracemalloc.stop()
+        growth = self._attribute(snapshot)
+        del snapshot
+        if self.baseline is not None:
+            for key, size in self.baseline.items():
+                growth[key] = growth.get(key, 0) - size
+            self.baseline = None
+        self._record(growth)
+        self.samples += 1
+        metrics.inc("memory_samples")
+        metrics.observe_phase("memory_sample", time.perf_counter() - start)
+
+    @staticmethod
+    def _attribute(snapshot):
+        """按最内层的插件代码汇总快照中的内存: 内容键 -> 字节数。"""
+        owners = shared_code.owners()
+        sizes = {}
+        for stat in snapshot.statistics("traceback"):
+            # 帧按从外到内排列
+            for frame in reversed(stat.traceback):
+                key = owners.get(frame.filename)
+                if key is not None:
+                    sizes[key] = sizes.get(key, 0) + stat.size
+                    break
+        return sizes
+
+    def _record(self, growth):
+        modules = self.modules
+        # 已没有文件使用的代码不再统计
+        for key in [k for k in modules if k not in shared_code.codes]:
+            del modules[key]
+        for key in growth.keys() - modules.keys():
+            if growth[key] > 0:
+                modules[key] = ModuleMemoryStats()
+        suspected = 0
+        for key, stats in modules.items():
+            size = growth.get(key, 0)
+            stats.history.append(size)
+            stats.total += size
+            stats.rising = stats.rising + 1 if size >= MEMORY_LEAK_MIN_BYTES else 0
+            if stats.rising >= MEMORY_LEAK_SAMPLES:
+                suspected += 1
+        metrics.set_gauge("memory_suspected_leaks", suspected)
+
+    def report(self, limit=20):
+        """
+        按是否疑似泄漏、最近采样的保留增长排序的列表，每项对应一份代码：
+        module/file 取共享它的文件中排序最前的一个，shared_files 为共享它的文件数（大于 1 时 files 列出其中前 10 个）。
+        """
+        items = sorted(self.modules.items(),
+                       key=lambda item: (item[1].rising >= MEMORY_LEAK_SAMPLES, sum(item[1].history)),
+                       reverse=True)[:limit]
+        groups = shared_code.files_by_key() if items else {}
+        report = []
+        for key, stats in items:
+            files = sorted(groups.get(key, ()))
+            entry = {
+                "module": module_name_of(files[0]) if files else key[:16],
+                "file": files[0] if files else None,
+                "shared_files": len(files),
+                "last_bytes": stats.history[-1] if stats.history else 0,
+                "recent_bytes": sum(stats.history),
+                "total_bytes": stats.total,
+                "rising_samples": stats.rising,
+                "suspected_leak": stats.rising >= MEMORY_LEAK_SAMPLES,
+            }
+            if len(files) > 1:
+                entry["files"] = files[:10]
+            report.append(entry)
+        return report
+
+
+memory_profiler = MemoryProfiler(MEMORY_SAMPLE_EVERY)
+
+
+class ScanDelta:
+    """一次目录扫描相对上一次快照的差异。"""
+    __slots__ = ("added", "changed", "removed")
+
+    def __init__(self, added=(), changed=(), removed=()):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+class DirectoryScanner:
+    """
+    基于 os.scandir 的目录快照扫描器。
+    快照记录每个 .py 文件的 (inode, size, mtime_ns)，每次 scan() 只返回增量，
+    目录未变化时不做任何读文件、编译或模块处理。
+    但每次 scan() 仍要完整读一遍目录，并对每个文件做一次 stat、构造一个元组，开销与文件数成正比；
+    只有 InotifyWatcher 在目录未变化时能跳过这些逐文件的工作。
+    """
+
+    def __init__(self, base_dir, suffix='.py'):
+        self.base_dir = base_dir
+        self.suffix = suffix
+        self.snapshot = {}
+
+    def _read_dir(self):
+        suffix = self.suffix
+        current = {}
+        with os.scandir(self.base_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(suffix):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    # 扫描期间被删除的文件
+                    continue
+                current[entry.path] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        return current
+
+    def scan(self):
+        current = self._read_dir()
+        previous = self.snapshot
+        if current == previous:
+            return ScanDelta()
+
+        added = current.keys() - previous.keys()
+        removed = previous.keys() - current.keys()
+        changed = [p for p in current.keys() & previous.keys() if current[p] != previous[p]]
+        self.snapshot = current
+        return ScanDelta(sorted(added), sorted(changed), sorted(removed))
+
+    def scan_paths(self, paths):
+        """只刷新指定文件的快照项，用于事件驱动的增量更新。"""
+        added, changed, removed = [], [], []
+        snapshot = self.snapshot
+        for path in sorted(paths):
+            try:
+                st = os.stat(path)
+                is_file = not os.path.isdir(path)
+            except OSError:
+                st, is_file = None, False
+            if st is None or not is_file:
+                if snapshot.pop(path, None) is not None:
+                    removed.append(path)
+                continue
+            signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+            previous = snapshot.get(path)
+            if previous is None:
+                added.append(path)
+            elif previous != signature:
+                changed.append(path)
+            else:
+                continue
+            snapshot[path] = signature
+        return ScanDelta(added, changed, removed)
+
+    def reset(self):
+        self.snapshot = {}
+
+
+# 每个扫描目录一个扫描器
+_scanners = {}
+
+def get_scanner(base_dir):
+    scanner = _scanners.get(base_dir)
+    if scanner is None:
+        scanner = _scanners[base_dir] = DirectoryScanner(base_dir)
+    return scanner
+
+
+# 目录变更监听方式: auto（优先 inotify，不可用时轮询）、inotify、poll
+WATCH_MODE = os.environ.get("RUNNER_WATCH_MODE", "auto")
+# 只收到 IN_CREATE 而未写完的文件，最多等待这么久后再交给扫描器
+WATCH_SETTLE_SECONDS = 5
+# inotify 模式下兜底的全量扫描间隔，防止遗漏事件
+WATCH_FULL_RESCAN_SECONDS = 300
+
+# inotify 常量，见 <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+class PollingWatcher:
+    """轮询方式：每次 poll() 都做一次快照扫描。"""
+    mode = "poll"
+
+    def __init__(self, scanner):
+        self.scanner = scanner
+
+    def poll(self):
+        return self.scanner.scan()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    基于 Linux inotify（ctypes 调用 libc）的目录变更监听。
+    同一文件在两次 poll() 之间的多次事件合并为一项；只有 IN_CREATE 的文件视为仍在写入
+    （如 cp 循环），等到 IN_CLOSE_WRITE 或超过 WATCH_SETTLE_SECONDS 才交给扫描器刷新。
+    没有事件时 poll() 只做一次非阻塞 read，队列溢出或目录本身被移走时退回全量扫描。
+    """
+    mode = "inotify"
+
+    EVENT_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                  | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF)
+    # 收到这些事件说明文件内容已经稳定
+    SETTLED_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_ATTRIB
+
+    def __init__(self, scanner):
+        import ctypes
+        import ctypes.util
+        import struct
+
+        self.scanner = scanner
+        self._struct = struct
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(scanner.base_dir), self.EVENT_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch 失败: {scanner.base_dir}")
+        self.pending = {}
+        self.needs_full_scan = True
+        self.last_full_scan = 0.0
+
+    def _drain(self):
+        """读出内核中所有待处理事件，合并到 pending: path -> [最近事件掩码, 首次出现时间]。"""
+        unpack_from = self._struct.unpack_from
+        suffix = self.scanner.suffix
+        base_dir = self.scanner.base_dir
+        pending = self.pending
+        now = time.monotonic()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            if not buf:
+                return
+            offset = 0
+            while offset < len(buf):
+                wd, mask, cookie, length = unpack_from("iIII", buf, offset)
+                offset += 16
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    logging.warning("inotify 事件溢出或监听目录失效，退回全量扫描: %s", base_dir)
+                    self.needs_full_scan = True
+                    continue
+                if name:
+                    name = os.fsdecode(name)
+                    if name.endswith(suffix):
+                        path = os.path.join(base_dir, name)
+                        item = pending.get(path)
+                        if item is None:
+                            pending[path] = [mask, now]
+                        else:
+                            item[0] = mask
+
+    def poll(self):
+        self._drain()
+        now = time.monotonic()
+        if now - self.last_full_scan > WATCH_FULL_RESCAN_SECONDS:
+            self.needs_full_scan = True
+        if self.needs_full_scan:
+            self.needs_full_scan = False
+            self.last_full_scan = now
+            self.pending.clear()
+            return self.scanner.scan()
+        if not self.pending:
+            return ScanDelta()
+
+        settled_mask = self.SETTLED_MASK
+        settle = WATCH_SETTLE_SECONDS
+        ready = [p for p, (mask, first_seen) in self.pending.items()
+                 if mask & settled_mask or now - first_seen >= settle]
+        for path in ready:
+            del self.pending[path]
+        return self.scanner.scan_paths(ready)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(base_dir):
+    scanner = get_scanner(base_dir)
+    if WATCH_MODE != "poll" and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(scanner)
+        except Exception as e:
+            level = logging.error if WATCH_MODE == "inotify" else logging.info
+            level("inotify 不可用，改用轮询扫描: %s", e)
+    return PollingWatcher(scanner)
+
+
+# 每个扫描目录一个监听器
+_watchers = {}
+
+def get_watcher(base_dir):
+    watcher = _watchers.get(base_dir)
+    if watcher is None:
+        watcher = _watchers[base_dir] = create_watcher(base_dir)
+    return watcher
+
+
+def module_name_of(file_path):
+    return os.path.basename(file_path)[:-3]
+
+
+def _mix64(x):
+    """splitmix64 的末尾混合函数，把相近的输入打散到整个 64 位空间。"""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+def shard_of(file_path, shard_count):
+    """
+    按文件名的稳定哈希分配分片，与进程、上下文和目录的绝对路径无关。
+    采用最高随机权重（rendezvous）哈希：分片数从 N 变为 N+1 时只有约 1/(N+1) 的文件换分片。
+    """
+    if shard_count <= 1:
+        return 0
+    import zlib
+    h = zlib.crc32(os.path.basename(file_path).encode('utf-8'))
+    return max(range(shard_count), key=lambda shard: _mix64(h ^ (shard * 0x9E3779B97F4A7C15)))
+
+
+# 本上下文负责的分片 (shard_id, shard_count)，(0, 1) 表示不分片
+current_shard = (0, 1)
+
+
+def select_shard(delta, scanner, shard):
+    """
+    把扫描增量限制在本上下文的分片内。分片配置变化时按当前快照重新分配：
+    卸载不再属于本分片的模块，加载新划入本分片的文件。
+    """
+    global current_shard
+    shard_id, shard_count = shard
+    if shard == current_shard and shard_count == 1:
+        return delta
+
+    def owns(file_path):
+        return shard_of(file_path, shard_count) == shard_id
+
+    added = [p for p in delta.added if owns(p)]
+    changed = [p for p in delta.changed if owns(p)]
+    removed = [p for p in delta.removed if owns(p) or p in loaded_modules or p in module_cache.evicted]
+    if shard != current_shard:
+        pending = set(delta.added) | set(delta.changed)
+        tracked = loaded_modules.keys() | module_cache.evicted
+        dropped = [p for p in tracked if not owns(p)]
+        picked = sorted(p for p in scanner.snapshot if p not in pending and p not in tracked and owns(p))
+        removed.extend(dropped)
+        added.extend(picked)
+        logging.error("分片由 %s 调整为 %s：卸载 %d 个模块，新增 %d 个文件",
+                      current_shard, shard, len(dropped), len(picked))
+        metrics.inc("shard_rebalances")
+        current_shard = shard
+    metrics.set_gauge("shard_id", shard_id)
+    metrics.set_gauge("shard_count", shard_count)
+    return ScanDelta(added, changed, removed)
+
+
+# 依赖图不跟踪这些目录下的模块（以 os.pathsep 分隔），标准库和 site-packages 总是排除在外
+DEPENDENCY_EXCLUDE_DIRS = os.environ.get("RUNNER_DEPENDENCY_EXCLUDE", "")
+
 
+class DependencyGraph:
+    """
+    插件与 sys.path 上辅助模块之间的导入依赖图，节点为源文件：
+    - 插件的导入由清洗时记录（plugin_metadata 的 imports），辅助模块的导入在首次发现时用 AST 读取；
+    - 模块名按 sys.path 定位源文件（PathFinder，不执行任何导入），标准库、site-packages、
+      内置和扩展模块不纳入图中；
+    - poll() 每个周期 stat 一遍图中的辅助模块，变化时把它和传递依赖它的辅助模块从 sys.modules 中移除，
+      返回传递依赖它们的插件，由 load_all_py_files 只重新加载这些插件；
+    - 定位不到的模块名（如尚未创建的辅助模块）记在 unresolved 中，poll() 每个周期重新定位，
+      出现后按导入它的文件发生变化处理。
+    插件文件本身也可能被其他插件当作辅助模块导入，两种身份互不影响。
+    """
 
-# 配置日志：级别为ERROR，写入文件，满1G切换，最多保留3个文件
-log_file = "python_runner.log"
-logging.basicConfig(
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(log_file, maxBytes=1024*1024*1024, backupCount=3)
-    ]
-)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.edges = {}        # file -> 直接依赖的辅助模块文件集合
+        self.dependents = {}   # file -> 直接依赖它的文件集合
+        self.plugins = set()
+        self.helpers = {}      # 辅助模块文件 -> [模块名集合, (mtime_ns, size)]
+        self.unresolved = {}   # file -> 它导入但在 sys.path 上定位不到的模块名集合
+        self._located = {}     # 模块名 -> _locate() 结果，辅助模块变化或出现新文件时清空
+        self._excluded = None
 
-# 禁止的模块前缀
-DISALLOWED_MODULE_PREFIXES = (
-    "os", "sys", "importlib", "subprocess", "socket", "shutil", "platform",
-    "pathlib", "urllib", "requests", "threading", "multiprocessing", "ctypes",
-    "sqlite3", "http", "builtins", "marshal", "inspect", "pkgutil", "psutil", "glob"
-)
+    def _is_excluded(self, file_path):
+        if self._excluded is None:
+            import sysconfig
+            paths = sysconfig.get_paths()
+            dirs = {paths.get(k) for k in ("stdlib", "platstdlib", "purelib", "platlib")}
+            dirs.update(DEPENDENCY_EXCLUDE_DIRS.split(os.pathsep))
+            self._excluded = tuple(os.path.join(os.path.abspath(d), "") for d in dirs if d)
+        parts = file_path.split(os.sep)
+        return "site-packages" in parts or "dist-packages" in parts or file_path.startswith(self._excluded)
 
-# 禁止的危险函数
-DISALLOWED_FUNCTIONS = {'eval', 'exec', '__import__', 'open', 'compile', 'globals', 'locals'}
+    def _locate(self, name):
+        """
+        返回 (导入 name 时会执行的辅助模块源文件 [(模块名, 文件)]，包括各级父包的 __init__.py, 是否定位到)。
+        某一段找不到时视为未定位到；标准库、内置和扩展模块算作已定位，只是不纳入图中。
+        """
+        cached = self._located.get(name)
+        if cached is not None:
+            return cached
+        from importlib.machinery import PathFinder
+        found = []
+        resolved = True
+        search_path = None
+        qualified = []
+        for part in name.split("."):
+            qualified.append(part)
+            try:
+                spec = PathFinder.find_spec(part, search_path)
+            except (ImportError, ValueError):
+                spec = None
+            if spec is None:
+                resolved = False
+                break
+            origin = spec.origin
+            if spec.has_location and origin and origin.endswith(".py"):
+                origin = os.path.abspath(origin)
+                if self._is_excluded(origin):
+                    break
+                found.append((".".join(qualified), origin))
+            search_path = spec.submodule_search_locations
+            if search_path is None:
+                break
+        self._located[name] = found, resolved
+        return found, resolved
 
-def is_disallowed_module(name):
-    return any(name.startswith(prefix) for prefix in DISALLOWED_MODULE_PREFIXES)
-
-class SecuritySanitizer(ast.NodeTransformer):
-    def visit_Import(self, node):
-        for alias in node.names:
-            if is_disallowed_module(alias.name):
-                logging.warning(f"移除不允许的导入: import {alias.name}")
-                return None
-        return node
-
-    def visit_ImportFrom(self, node):
-        full_module = node.module or ""
-        root_module = full_module.split('.')[0]
-        if node.level > 0 or is_disallowed_module(root_module):
-            msg = f"移除不允许的导入: from {'.'*node.level}{full_module}" if node.level > 0 else f"from {full_module}"
-            logging.warning(msg)
+    def _link(self, file_path, imports):
+        """把 file_path 的出边设置为 imports 解析到的辅助模块，返回新发现的辅助模块文件。"""
+        own_path = os.path.abspath(file_path)
+        targets = set()
+        new_helpers = []
+        missing = set()
+        for name in imports:
+            found, resolved = self._locate(name)
+            if not resolved:
+                # from a import b 中的 b 多半只是属性，也会留在这里，代价只是每个周期多定位一次
+                missing.add(name)
+            for module_name, helper in found:
+                if helper == own_path:
+                    continue
+                targets.add(helper)
+                entry = self.helpers.get(helper)
+                if entry is None:
+                    self.helpers[helper] = [{module_name}, self._signature(helper)]
+                    new_helpers.append(helper)
+                else:
+                    entry[0].add(module_name)
+        for old in self.edges.get(file_path, ()):
+            if old not in targets:
+                self.dependents.get(old, set()).discard(file_path)
+        for helper in targets:
+            self.dependents.setdefault(helper, set()).add(file_path)
+        self.edges[file_path] = targets
+        if missing:
+            self.unresolved[file_path] = missing
+        else:
+            self.unresolved.pop(file_path, None)
+        return new_helpers
+
+    def _scan_helper(self, helper):
+        """读取辅助模块的导入并建立出边；相对导入按其模块名解析。"""
+        import ast
+        try:
+            with open(helper, "rb") as f:
+                tree = ast.parse(f.read(), filename=helper)
+        except (OSError, SyntaxError, ValueError) as e:
+            logging.info("无法解析辅助模块 %s 的导入: %s", helper, e)
+            return self._link(helper, ())
+        package = ""
+        names = self.helpers[helper][0]
+        if names:
+            module_name = min(names)
+            package = module_name if helper.endswith("__init__.py") else module_name.rpartition(".")[0]
+        return self._link(helper, collect_imports(tree, package))
+
+    def _scan_all(self, pending):
+        while pending:
+            pending.extend(self._scan_helper(pending.pop()))
+
+    @staticmethod
+    def _signature(file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
             return None
-        return node
-
-    def visit_Call(self, node):
-        if isinstance(node.func, ast.Name) and node.func.id in DISALLOWED_FUNCTIONS:
-            logging.warning(f"移除不允许的函数调用: {node.func.id}")
-            return ast.Expr(value=ast.Constant(value=None))  # 替换为无害表达式
-        return self.generic_visit(node)
-    
-def load_and_sanitize_module(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source_code = f.read()
+        return st.st_mtime_ns, st.st_size
 
-        tree = ast.parse(source_code)
-        sanitizer = SecuritySanitizer()
-        modified_tree = sanitizer.visit(tree)
-        modified_tree = ast.fix_missing_locations(modified_tree)
-
-        code = compile(modified_tree, filename=file_path, mode='exec')
-        module = types.ModuleType(f"mod_{os.path.basename(file_path)[:-3]}")
-        module.__file__ = file_path
-        exec(code, module.__dict__)
-        logging.info("模块 %s 加载并清洗成功", file_path)
-        return module
-    except Exception as e:
-        logging.error("加载模块 %s 时出错: %s", file_path, e)
-        return None
+    def update_plugin(self, file_path, imports):
+        with self.lock:
+            self.plugins.add(file_path)
+            self._scan_all(self._link(file_path, imports))
+            self._prune()
 
-# 缓存模块加载状态
-loaded_modules = {}
-module_mtime_cache = {}
+    def remove_plugin(self, file_path):
+        with self.lock:
+            if file_path not in self.plugins:
+                return
+            self.plugins.discard(file_path)
+            if file_path not in self.helpers:
+                self._link(file_path, ())
+                self.edges.pop(file_path, None)
+                self.unresolved.pop(file_path, None)
+            self._prune()
 
-# 在模块顶部定义全局线程池
-cpu_count = os.cpu_count() or 4
-executor = ThreadPoolExecutor(max_workers=cpu_count)
+    def _prune(self):
+        """丢弃已没有任何插件依赖的辅助模块。"""
+        reachable = set()
+        stack = list(self.plugins)
+        while stack:
+            for helper in self.edges.get(stack.pop(), ()):
+                if helper not in reachable:
+                    reachable.add(helper)
+                    stack.append(helper)
+        for helper in [h for h in self.helpers if h not in reachable]:
+            del self.helpers[helper]
+            if helper not in self.plugins:
+                self._link(helper, ())
+                self.edges.pop(helper, None)
+                self.dependents.pop(helper, None)
+                self.unresolved.pop(helper, None)
 
-import resource
+    def _closure(self, files, graph):
+        seen = set(files)
+        stack = list(files)
+        while stack:
+            for other in graph.get(stack.pop(), ()):
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
 
-def get_memory_usage_mb():
-    usage = resource.getrusage(resource.RUSAGE_SELF)
-    return usage.ru_maxrss   # 单位: MB
+    def _newly_resolved(self):
+        """重新定位 unresolved 中的模块名，返回其中有模块名已能定位到的文件。"""
+        names = set().union(*self.unresolved.values())
+        for name in names:
+            self._located.pop(name, None)
+        appeared = {name for name in names if self._locate(name)[1]}
+        if not appeared:
+            return []
+        return [f for f, missing in self.unresolved.items() if not missing.isdisjoint(appeared)]
+
+    def poll(self, added=()):
+        """
+        检查辅助模块是否变化、此前定位不到的模块是否已出现，返回需要重新加载的插件文件集合。
+        added 为本周期插件目录中新增的文件，出现新的 .py 文件时作废模块定位缓存（它可能遮蔽已定位的模块）。
+        """
+        with self.lock:
+            if any(p.endswith(".py") for p in added):
+                self._located.clear()
+            changed = []
+            for helper, entry in self.helpers.items():
+                signature = self._signature(helper)
+                if signature != entry[1]:
+                    entry[1] = signature
+                    changed.append(helper)
+            appeared = self._newly_resolved() if self.unresolved else []
+            if not changed and not appeared:
+                return set()
+            self._located.clear()
+            affected = self._closure([*changed, *appeared], self.dependents)
+            # 依赖变化文件的辅助模块也要重新执行，否则仍持有旧对象的引用
+            for helper in affected:
+                entry = self.helpers.get(helper)
+                if entry is not None:
+                    for module_name in entry[0]:
+                        sys.modules.pop(module_name, None)
+            # 重新读取变化文件的导入；已删除的文件去掉出边，插件重新加载后不再引用它时由 _prune 移除
+            for helper in changed:
+                if self.helpers[helper][1] is None:
+                    self._link(helper, ())
+                else:
+                    self._scan_all([helper])
+            # 导入的模块刚出现的辅助模块重新读取导入；插件的出边在重新加载后由 update_plugin 更新
+            self._scan_all([f for f in appeared if f in self.helpers and f not in changed])
+            plugins = affected & self.plugins
+        logging.error("辅助模块 %s 已变化，重新加载 %d 个依赖它的插件", [*changed, *appeared][:5], len(plugins))
+        metrics.inc("dependency_reloads", len(plugins))
+        return plugins
+
+    def query(self, file_path=None):
+        """诊断用：不带参数时返回整张图，带文件路径时返回它的直接导入、传递依赖和传递被依赖。"""
+        with self.lock:
+            if file_path is None:
+                return {
+                    "plugins": {p: sorted(self.edges.get(p, ())) for p in sorted(self.plugins)},
+                    "helpers": {h: {"modules": sorted(entry[0]),
+                                    "imports": sorted(self.edges.get(h, ())),
+                                    "dependents": sorted(self.dependents.get(h, ()))}
+                                for h, entry in sorted(self.helpers.items())},
+                }
+            if file_path not in self.plugins:
+                file_path = os.path.abspath(file_path)
+            return {
+                "file": file_path,
+                "plugin": file_path in self.plugins,
+                "modules": sorted(self.helpers[file_path][0]) if file_path in self.helpers else [],
+                "imports": sorted(self.edges.get(file_path, ())),
+                "dependencies": sorted(self._closure([file_path], self.edges) - {file_path}),
+                "dependents": sorted(self._closure([file_path], self.dependents) - {file_path}),
+            }
+
+    def report_gauges(self):
+        metrics.set_gauge("dependency_helpers", len(self.helpers))
+        metrics.set_gauge("dependency_unresolved", len(self.unresolved))
+
+
+dependency_graph = DependencyGraph()
+
+
+def runner_dependency_graph(file_path=None):
+    """返回导入依赖图（JSON 字符串），供宿主通过 polyglot 绑定 runnerDependencyGraph 调用。"""
+    import json
+    return json.dumps(dependency_graph.query(file_path), ensure_ascii=False)
 
 
-def load_all_py_files(path=None):
+def load_all_py_files(path=None, shard_id=0, shard_count=1):
+    """
+    扫描 path 目录并执行到期的模块。shard_count > 1 时只负责按文件名哈希划到 shard_id 的那部分文件，
+    PythonPool 中的每个上下文各传自己的分片号，各自只解析、缓存和执行自己的一片。
+    """
     start_time = time.time()
-    base_dir = path
+    base_dir = path or os.getcwd()
+    shard_id, shard_count = int(shard_id), int(shard_count)
+    if shard_count < 1 or not 0 <= shard_id < shard_count:
+        raise ValueError(f"分片参数无效: shard_id={shard_id}, shard_count={shard_count}")
     # mem_before = get_memory_usage_mb()
     # try:
     #     import polyglot
@@ -102,105 +2100,1423 @@ def load_all_py_files(path=None):
     #     logging.info("使用默认路径（当前工作目录）: %s", e)
 
     logging.info("查找 .py 文件目录: %s", base_dir)
+    refresh_module_policy()
 
-    # 记录当前目录下的 py 文件
-    current_files = set()
-    modules_to_run = []
-    for filename in os.listdir(base_dir):
-        if filename.endswith('.py'):
-            file_path = os.path.join(base_dir, filename)
-            current_files.add(file_path)
-            mtime = os.path.getmtime(file_path)
-
-            # 判断是否需要重新加载
-            if file_path not in module_mtime_cache or module_mtime_cache[file_path] != mtime:
-                module = load_and_sanitize_module(file_path)
-                if module:
-                    loaded_modules[file_path] = module
-                    module_mtime_cache[file_path] = mtime
-                    logging.info("模块 %s 已重新加载", filename)
-                else:
-                    logging.warning("模块 %s 加载失败，跳过", filename)
-                    continue
-            else:
-                module = loaded_modules[file_path]
-                logging.info("模块 %s 使用缓存版本", filename)
+    # 只处理相对上次快照新增、修改、删除的文件，以及到了重试时间的加载失败的文件
+    phase_start = time.perf_counter()
+    watcher = get_watcher(base_dir)
+    scanner = watcher.scanner
+    delta = select_shard(watcher.poll(), scanner, (shard_id, shard_count))
+    # sys.path 上的辅助模块变化时，只重新加载传递依赖它的插件，包括此前因它加载失败的插件；
+    # 已被驱逐的插件重新加载时自然会用到新版本
+    dependents = dependency_graph.poll(delta.added)
+    if dependents:
+        pending = set(delta.added) | set(delta.changed) | set(delta.removed)
+        extra = sorted(p for p in dependents
+                       if p not in pending and p in scanner.snapshot and p not in module_cache.evicted
+                       and (shard_count == 1 or shard_of(p, shard_count) == shard_id))
+        if extra:
+            delta = ScanDelta(delta.added, [*delta.changed, *extra], delta.removed)
+    now = time.monotonic()
+    if failed_loads:
+        pending = set(delta.added) | set(delta.changed) | set(delta.removed)
+        retries = sorted(p for p, (_, retry_at) in failed_loads.items()
+                         if retry_at <= now and p not in pending and p in scanner.snapshot)
+        if retries:
+            logging.info("重试 %d 个此前加载失败的模块: %s", len(retries), retries[:20])
+            metrics.inc("load_retries", len(retries))
+            delta = ScanDelta(delta.added, [*delta.changed, *retries], delta.removed)
+    metrics.observe_phase("scan", time.perf_counter() - phase_start)
 
-            modules_to_run.append((module, filename[:-3]))
-
-    # 清理缓存中已被删除的 py 文件
-    removed_files = set(loaded_modules.keys()) - current_files
-    for file_path in removed_files:
+    phase_start = time.perf_counter()
+    released = 0
+    for file_path in delta.removed:
         logging.info("清理已删除的模块缓存: %s", file_path)
         loaded_modules.pop(file_path, None)
         module_mtime_cache.pop(file_path, None)
+        plugin_metadata.pop(file_path, None)
+        module_runtime.pop(file_path, None)
+        namespace_guards.pop(file_path, None)
+        shared_code.release(file_path)
+        scheduler.remove(file_path)
+        metrics.forget_module(module_name_of(file_path))
+        module_cache.forget(file_path)
+        plugin_imports.pop(file_path, None)
+        failed_loads.pop(file_path, None)
+        dependency_graph.remove_plugin(file_path)
+        released += 1
 
-    results = []
-    futures = {executor.submit(execute_module_method, m, n): n for m, n in modules_to_run}
-    for future in as_completed(futures):
-        name = futures[future]
-        try:
-            result = future.result()
-            # results.append((name, result))
-        except Exception as e:
-            logging.error("执行模块 '%s' 过程中出错: %s", name, e)
+    released += sum(1 for p in delta.changed if p in loaded_modules)
+
+    for file_path, module in load_and_sanitize_modules([*delta.added, *delta.changed]).items():
+        if module:
+            loaded_modules[file_path] = module
+            module_mtime_cache[file_path] = scanner.snapshot.get(file_path)
+            scheduler.add(file_path, plugin_metadata.get(file_path, {}), now)
+            module_cache.admit(file_path, module)
+            failed_loads.pop(file_path, None)
+            dependency_graph.update_plugin(file_path, plugin_imports.get(file_path, ()))
+            logging.info("模块 %s 已重新加载", file_path)
+        else:
+            loaded_modules.pop(file_path, None)
+            module_mtime_cache.pop(file_path, None)
+            scheduler.remove(file_path)
+            module_cache.forget(file_path)
+            # 代码能编译、只是执行失败的插件留在依赖图中，它导入的辅助模块变化后会再试一次
+            if plugin_imports.get(file_path):
+                dependency_graph.update_plugin(file_path, plugin_imports[file_path])
+            else:
+                dependency_graph.remove_plugin(file_path)
+            failures = failed_loads.get(file_path, (0, 0))[0] + 1
+            backoff = min(LOAD_RETRY_MAX_SECONDS, LOAD_RETRY_BASE_SECONDS * 2 ** min(failures - 1, 32))
+            failed_loads[file_path] = (failures, now + backoff)
+            logging.warning("模块 %s 加载失败（连续 %d 次），%.0f 秒后重试", file_path, failures, backoff)
+    if delta:
+        metrics.observe_phase("load", time.perf_counter() - phase_start)
+        # 注册表变化后冻结长期存活的模块对象
+        gc_policy.after_load(loaded=bool(delta.added or delta.changed), released=released)
+
+    # 只执行本轮到期的模块，已按优先级排好序；到期但已被驱逐的模块先重新加载
+    due = scheduler.pop_due(now)
+    rehydrated = 0
+    if module_cache.evicted:
+        missing = [p for p in due if p not in loaded_modules]
+        if missing:
+            phase_start = time.perf_counter()
+            rehydrated = module_cache.rehydrate(missing)
+            metrics.observe_phase("rehydrate", time.perf_counter() - phase_start)
+    modules_to_run = []
+    async_modules = []  # async def execute() 的模块交给事件循环线程，不占用线程池
+    for p in due:
+        module = loaded_modules.get(p)
+        if module is not None:
+            (async_modules if is_async_module(module) else modules_to_run).append((module, module_name_of(p)))
+            module_cache.touch(p)
+    metrics.set_gauge("loaded_modules", len(loaded_modules))
+    metrics.set_gauge("failed_modules", len(failed_loads))
+    metrics.set_gauge("due_modules", len(modules_to_run) + len(async_modules))
+
+    cycle_deadline = time.time() + CYCLE_TIMEOUT_SECONDS
+    memory_profiler.begin_cycle()
+    phase_start = time.perf_counter()
+    async_future, unstarted = async_runner.submit(async_modules)
+    not_started = None
+    if EXECUTION_BACKEND == "fork":
+        not_started = run_in_forked_workers(modules_to_run, registry_changed=bool(delta) or rehydrated > 0,
+                                            deadline=cycle_deadline)
+    if not_started is None:
+        not_started = run_in_thread_pool(modules_to_run, cycle_deadline)
+    unstarted.extend(not_started)
+    async_runner.wait(async_future, cycle_deadline)
+    # 没有开始执行的模块立即重新到期，不因本轮超时或跳过而错过一整个 INTERVAL
+    scheduler.requeue([m.__file__ for m, _ in unstarted], now)
+    metrics.observe_phase("execute", time.perf_counter() - phase_start)
+
+    # 本周期各模块缓冲的 processData 请求一次性发给 Java
+    phase_start = time.perf_counter()
+    if java_bridge.flush():
+        metrics.observe_phase("bridge", time.perf_counter() - phase_start)
+    memory_profiler.end_cycle()
+
+    # 超出模块缓存预算时驱逐最久未执行的模块；它们已被冻结，累计到一定数量后由 GC 策略解冻回收
+    evicted = module_cache.evict()
+    if evicted:
+        gc_policy.after_load(loaded=False, released=evicted)
+    module_cache.report_gauges()
+    dependency_graph.report_gauges()
+    metrics.set_gauge("results_queued", result_sink.queue.qsize())
 
-    for name, result in results:
-        logging.info("模块 '%s' 执行结果: %s", name, result)
-    
     modules_to_run.clear()
-    results.clear()
 
     elapsed = time.time() - start_time  # 计算耗时
     if elapsed > 1:
         logging.error("load_all_py_files 执行时间过长: %.2f 秒", elapsed)
 
-    import gc
-    gc.collect()  # 强制垃圾回收，清理内存
+    phase_start = time.perf_counter()
+    gc_policy.end_of_cycle()  # 只在分配量或内存增长超过阈值时做完整回收
+    metrics.observe_phase("gc", time.perf_counter() - phase_start)
+    metrics.observe_phase("cycle", time.time() - start_time)
+    metrics.maybe_write_textfile()
 
     # mem_after = get_memory_usage_mb()
     # logging.error(f"内存变化: {mem_after - mem_before:.2f} KB")    
 
 
+class ModuleScheduler:
+    """
+    基于最小堆的模块调度器：按插件声明的 INTERVAL 决定何时到期，同一轮内按 PRIORITY 从高到低执行。
+    每轮只弹出到期的模块，开销与到期模块数成正比，与目录中的文件总数无关。
+    """
+
+    def __init__(self):
+        self.heap = []      # (到期时间, 序号, file_path)
+        self.entries = {}   # file_path -> (序号, interval, priority)
+        self.seq = itertools.count()
+
+    def add(self, file_path, metadata, now):
+        """登记（或重新登记）一个模块，立即到期；堆中的旧项在弹出时按序号惰性丢弃。"""
+        seq = next(self.seq)
+        self.entries[file_path] = (seq, metadata.get("INTERVAL", 0), metadata.get("PRIORITY", 0))
+        heapq.heappush(self.heap, (now, seq, file_path))
+
+    def remove(self, file_path):
+        self.entries.pop(file_path, None)
+
+    def pop_due(self, now):
+        """弹出到期的模块并按 interval 排好下次到期时间；本轮实际没有开始执行的模块由调用方 requeue 放回。"""
+        heap = self.heap
+        entries = self.entries
+        due = []
+        while heap and heap[0][0] <= now:
+            _, seq, file_path = heapq.heappop(heap)
+            entry = entries.get(file_path)
+            if entry is not None and entry[0] == seq:
+                due.append((file_path, entry))
+        for file_path, (seq, interval, _) in due:
+            heapq.heappush(heap, (now + interval, seq, file_path))
+        due.sort(key=lambda item: -item[1][2])
+        return [file_path for file_path, _ in due]
+
+    def requeue(self, file_paths, when):
+        """把本轮到期却没有开始执行的模块（超过期限未开始、上一轮仍未结束而跳过）重新排在 when 到期，不等一个 INTERVAL。"""
+        for file_path in file_paths:
+            entry = self.entries.get(file_path)
+            if entry is None:
+                continue
+            seq = next(self.seq)
+            self.entries[file_path] = (seq, *entry[1:])
+            heapq.heappush(self.heap, (when, seq, file_path))
+
+    def __len__(self):
+        return len(self.entries)
+
+
+scheduler = ModuleScheduler()
+
+
+# 常驻模块数上限与命名空间字节数上限（MB），超出时驱逐最久未执行的模块；0 表示不限
+MODULE_CACHE_MAX_ENTRIES = int(os.environ.get("RUNNER_MODULE_CACHE_MAX_ENTRIES", "0"))
+MODULE_CACHE_MAX_BYTES = int(float(os.environ.get("RUNNER_MODULE_CACHE_MAX_MB", "0")) * 1024 * 1024)
+
+
+class ModuleCache:
+    """
+    loaded_modules 的容量控制。按最近一次执行的先后维护 LRU 顺序，超出条目数或字节预算时驱逐最久未执行的模块：
+    只丢弃模块对象、命名空间和共享代码引用，调度项、元数据和目录快照保留，因此不会被当作新文件。
+    被驱逐的模块再次到期时按文件重新加载，代码对象来自共享代码表或磁盘代码缓存，通常不需要重新编译；
+    模块顶层代码会重新执行，模块级状态与文件修改后重新加载时一样被重置。
+    字节数是命名空间的浅层估算（字典本身加各个值的 sys.getsizeof），不含被引用对象的内部结构。
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lru = collections.OrderedDict()  # file_path -> 估算字节数，最久未执行的在前
+        self.total_bytes = 0
+        self.evicted = set()
+        self.evictions = 0
+        self.rehydrations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or self.max_bytes > 0
+
+    @staticmethod
+    def estimate(module):
+        namespace = module.__dict__
+        size = sys.getsizeof(namespace)
+        for value in list(namespace.values()):
+            try:
+                size += sys.getsizeof(value)
+            except TypeError:
+                pass
+        return size
+
+    def admit(self, file_path, module):
+        if not self.enabled:
+            return
+        self.forget(file_path)
+        size = self.estimate(module)
+        self.lru[file_path] = size
+        self.total_bytes += size
+
+    def touch(self, file_path):
+        if file_path in self.lru:
+            self.lru.move_to_end(file_path)
+
+    def forget(self, file_path):
+        size = self.lru.pop(file_path, None)
+        if size is not None:
+            self.total_bytes -= size
+        self.evicted.discard(file_path)
+
+    def over_budget(self):
+        return ((self.max_entries > 0 and len(self.lru) > self.max_entries)
+                or (self.max_bytes > 0 and self.total_bytes > self.max_bytes))
+
+    def evict(self):
+        """驱逐最久未执行的模块直到回到预算内，仍在执行中的模块跳过。返回驱逐的个数。"""
+        if not self.enabled or not self.over_budget():
+            return 0
+        # 线程池中滞留的模块和仍在事件循环上执行的协程模块都不能驱逐，否则重新载入后新旧两个实例同时运行
+        busy = {getattr(m, "__file__", None) for m in [*in_flight_modules, *async_runner.running_modules()]}
+        count = 0
+        for file_path in list(self.lru):
+            if not self.over_budget():
+                break
+            if file_path in busy:
+                continue
+            self.total_bytes -= self.lru.pop(file_path)
+            loaded_modules.pop(file_path, None)
+            namespace_guards.pop(file_path, None)
+            shared_code.release(file_path)
+            self.evicted.add(file_path)
+            count += 1
+        self.evictions += count
+        metrics.inc("module_cache_evictions", count)
+        return count
+
+    def rehydrate(self, file_paths):
+        """重新加载到期的已驱逐模块，加载失败的（如文件已不可读）从调度中移除。返回成功的个数。"""
+        count = 0
+        for file_path, module in load_and_sanitize_modules(file_paths).items():
+            self.evicted.discard(file_path)
+            if module:
+                loaded_modules[file_path] = module
+                self.admit(file_path, module)
+                count += 1
+            else:
+                module_mtime_cache.pop(file_path, None)
+                scheduler.remove(file_path)
+                logging.warning("模块 %s 重新加载失败，跳过", file_path)
+        self.rehydrations += count
+        metrics.inc("module_cache_rehydrations", count)
+        return count
+
+    def report_gauges(self):
+        if self.enabled:
+            metrics.set_gauge("module_cache_bytes", self.total_bytes)
+            metrics.set_gauge("module_cache_evicted", len(self.evicted))
+
+
+module_cache = ModuleCache(MODULE_CACHE_MAX_ENTRIES, MODULE_CACHE_MAX_BYTES)
+
+
+# 同时提交到线程池的批次上限，避免每轮一次性创建上万个 Future
+MAX_IN_FLIGHT_BATCHES = int(os.environ.get("RUNNER_MAX_IN_FLIGHT_BATCHES", "0")) or cpu_count * 2
+# 每个批次的目标耗时（秒）：按实测耗时把多个短模块合并成一个线程池任务
+BATCH_TARGET_SECONDS = 0.005
+BATCH_MAX_MODULES = 256
+# 尚无实测数据的模块按该耗时估算
+UNMEASURED_RUNTIME_SECONDS = BATCH_TARGET_SECONDS / 4
+
+# 各模块 execute() 耗时的指数滑动平均: file_path -> 秒
+module_runtime = {}
+
+
+def record_runtime(module, elapsed):
+    file_path = getattr(module, "__file__", None)
+    previous = module_runtime.get(file_path)
+    module_runtime[file_path] = elapsed if previous is None else previous * 0.8 + elapsed * 0.2
+
+
+def make_batches(modules_to_run):
+    """按实测耗时把模块切分成批次，保持原有的优先级顺序。"""
+    batch = []
+    cost = 0.0
+    for module, name in modules_to_run:
+        estimate = module_runtime.get(getattr(module, "__file__", None), UNMEASURED_RUNTIME_SECONDS)
+        if batch and (cost + estimate > BATCH_TARGET_SECONDS or len(batch) >= BATCH_MAX_MODULES):
+            yield batch
+            batch = []
+            cost = 0.0
+        batch.append((module, name))
+        cost += estimate
+    if batch:
+        yield batch
+
+
+def run_batch(batch, deadline, progress):
+    """
+    线程池任务：依次执行一批模块，到达本轮期限后不再开始新的模块。progress[0] 为当前执行到的下标。
+    返回因期限而没有开始执行的模块。
+    """
+    for index, (module, name) in enumerate(batch):
+        progress[0] = index
+        if time.time() >= deadline:
+            return batch[index:]
+        try:
+            result_sink.put(name, execute_module_method(module, name))
+        except Exception as e:
+            logging.error("执行模块 '%s' 过程中出错: %s", name, e)
+    progress[0] = len(batch)
+    return []
+
+
+def run_in_thread_pool(modules_to_run, deadline):
+    """
+    在全局线程池中执行一轮，最多等到 deadline（time.time() 时间）。
+    模块按实测耗时合并成批次流式提交，同时在途的批次不超过 MAX_IN_FLIGHT_BATCHES。
+    到期仍未完成的模块记为滞留：正在执行的置位取消标记并留到后续轮次完成，未开始的本轮不再执行。
+    返回本轮没有开始执行的模块 [(module, name), ...]（含因上一轮仍未结束而跳过的）。
+    """
+    for module in [m for m, f in in_flight_modules.items() if f.done()]:
+        del in_flight_modules[module]
+
+    runnable = []
+    skipped = []
+    for m, n in modules_to_run:
+        if m in in_flight_modules:
+            skipped.append((m, n))
+        else:
+            runnable.append((m, n))
+    if skipped:
+        logging.error("%d 个模块上一轮仍未结束，本轮跳过: %s", len(skipped), [n for _, n in skipped[:20]])
+
+    from concurrent.futures import FIRST_COMPLETED, wait as wait_futures
+
+    batches = make_batches(runnable)
+    pending = {}  # future -> (batch, progress)
+
+    def submit_next():
+        batch = next(batches, None)
+        if batch is not None:
+            progress = [0]
+            pending[get_executor().submit(run_batch, batch, deadline, progress)] = (batch, progress)
+
+    for _ in range(MAX_IN_FLIGHT_BATCHES):
+        submit_next()
+    metrics.set_gauge("in_flight_batches", len(pending))
+    not_started = []
+    while pending:
+        done, _ = wait_futures(pending, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            del pending[future]
+            not_started.extend(future.result())
+            submit_next()
+
+    if not pending:
+        if not_started:
+            logging.error("本轮执行超过 %.1f 秒，%d 个模块未开始执行: %s",
+                          CYCLE_TIMEOUT_SECONDS, len(not_started), [n for _, n in not_started[:20]])
+            metrics.inc("modules_not_started", len(not_started))
+        metrics.set_gauge("stragglers", 0)
+        return skipped + not_started
+    stragglers = []
+    not_started.extend(item for batch in batches for item in batch)
+    for future, (batch, progress) in pending.items():
+        if future.cancel():
+            not_started.extend(batch)
+            continue
+        if future.done():
+            # 期限到达后才结束的批次
+            not_started.extend(future.result())
+            continue
+        index = progress[0]
+        if index < len(batch):
+            m, n = batch[index]
+            token = getattr(m, "cancel_token", None)
+            if token is not None:
+                token.cancel()
+            # 批次里排在它后面的模块会因已过期限而不再开始，只有它本身需要留到后续轮次
+            in_flight_modules[m] = future
+            stragglers.append(n)
+            not_started.extend(batch[index + 1:])
+    logging.error("本轮执行超过 %.1f 秒，%d 个模块未完成: %s；%d 个模块未开始执行: %s",
+                  CYCLE_TIMEOUT_SECONDS, len(stragglers), stragglers[:20],
+                  len(not_started), [n for _, n in not_started[:20]])
+    if stragglers:
+        retire_executor()
+    metrics.set_gauge("stragglers", len(stragglers))
+    metrics.inc("modules_not_started", len(not_started))
+    return skipped + not_started
+
+
 def execute_module_method(module, module_name):
+    token = getattr(module, "cancel_token", None)
+    guard = namespace_guard_of(module)
     try:
-        if hasattr(module, "__dict__"):
-            before_keys = set(module.__dict__.keys())
-        else:
-            before_keys = set()
         if hasattr(module, "execute") and callable(module.execute):
             start_time = time.time()
+            timeout = token.timeout if token is not None else MODULE_TIMEOUT_SECONDS
+            if token is not None:
+                token.reset()
+                watchdog.watch(token, module_name)
             result = module.execute()
             elapsed = time.time() - start_time
+            record_runtime(module, elapsed)
+            metrics.observe_module(module_name, elapsed)
             logging.info("模块 '%s' 执行耗时 %.2f 秒，结果: %s", module_name, elapsed, result)
-            if elapsed > 5:
-                logging.warning("模块 '%s' 执行时间超过 5 秒", module_name)
+            if elapsed > timeout:
+                logging.warning("模块 '%s' 执行时间超过 %.1f 秒", module_name, timeout)
             return result
         else:
             logging.info("模块 '%s' 没有可执行的 execute 方法", module_name)
             return None
     finally:
-        # 只清理新增属性，不移除缓存
-        if hasattr(module, "__dict__"):
-            after_keys = set(module.__dict__.keys())
-            new_keys = after_keys - before_keys
-            for k in new_keys:
-                try:
-                    del module.__dict__[k]
-                except Exception:
-                    pass
+        if token is not None:
+            watchdog.unwatch(token)
+        # 恢复命名空间到加载时的基线，不移除缓存
+        if guard is not None:
+            guard.restore()
         # 不要在这里 pop loaded_modules
 
+# 协程插件（async def execute()）在专用事件循环线程上同时执行的上限
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("RUNNER_ASYNC_MAX_CONCURRENCY", "256"))
+# 即 inspect.CO_COROUTINE；inspect 导入较重，这里直接使用常量
+CO_COROUTINE = 0x80
+
+
+def is_async_module(module):
+    """模块的 execute 是否为 async def 定义的协程函数。"""
+    code = getattr(getattr(module, "execute", None), "__code__", None)
+    return code is not None and bool(code.co_flags & CO_COROUTINE)
+
+
+class AsyncRunner:
+    """
+    协程插件的执行器：async def execute() 的模块不占用线程池线程，而是提交到专用的事件循环线程
+    （首次使用时才导入 asyncio 并启动）上并发执行，同时执行的协程不超过 max_concurrency 个。
+    单个模块超时后由 asyncio.wait_for 取消（协程在 await 处收到 CancelledError），同时置位 cancel_token；
+    本轮期限到达时仍未结束的模块留在事件循环上，下一轮跳过它们。
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(1, max_concurrency)
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.running = {}  # 仍在事件循环上执行的模块: module -> module_name
+
+    def _ensure_loop(self):
+        with self.lock:
+            if self.loop is None:
+                import asyncio
+                loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=loop.run_forever, name="runner-asyncio", daemon=True)
+                self.thread.start()
+                self.loop = loop
+            return self.loop
+
+    async def _run_module(self, module, module_name):
+        import asyncio
+        token = getattr(module, "cancel_token", None)
+        timeout = token.timeout if token is not None else MODULE_TIMEOUT_SECONDS
+        guard = namespace_guard_of(module)
+        try:
+            async with self.semaphore:
+                if token is not None:
+                    token.reset()
+                start_time = time.time()
+                try:
+                    result = await asyncio.wait_for(module.execute(), timeout)
+                except asyncio.TimeoutError:
+                    if token is not None:
+                        token.cancel()
+                    metrics.inc("async_timeouts")
+                    logging.error("协程模块 '%s' 执行超过 %.1f 秒，已取消", module_name, timeout)
+                    return
+                elapsed = time.time() - start_time
+                record_runtime(module, elapsed)
+                metrics.observe_module(module_name, elapsed)
+                logging.info("模块 '%s' 执行耗时 %.2f 秒，结果: %s", module_name, elapsed, result)
+                result_sink.put(module_name, result, block=False)
+        except Exception as e:
+            logging.error("执行模块 '%s' 过程中出错: %s", module_name, e)
+        finally:
+            if guard is not None:
+                guard.restore()
+            with self.lock:
+                self.running.pop(module, None)
+
+    def running_modules(self):
+        """仍在事件循环上执行（或等待信号量）的模块。"""
+        with self.lock:
+            return list(self.running)
+
+    async def _run_all(self, modules):
+        import asyncio
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(self._run_module(m, n) for m, n in modules))
+
+    def submit(self, modules_to_run):
+        """
+        提交本轮的协程模块，立即返回 (concurrent.futures.Future, 因上一轮仍未结束而跳过的模块)；
+        没有可执行的模块时 Future 为 None。
+        """
+        if not modules_to_run:
+            return None, []
+        runnable = []
+        skipped = []
+        with self.lock:
+            for m, n in modules_to_run:
+                if m in self.running:
+                    skipped.append((m, n))
+                else:
+                    self.running[m] = n
+                    runnable.append((m, n))
+        if skipped:
+            logging.error("%d 个协程模块上一轮仍未结束，本轮跳过: %s", len(skipped), [n for _, n in skipped[:20]])
+        metrics.set_gauge("async_modules", len(runnable))
+        if not runnable:
+            return None, skipped
+        import asyncio
+        return asyncio.run_coroutine_threadsafe(self._run_all(runnable), self._ensure_loop()), skipped
+
+    def wait(self, future, deadline):
+        """等待 submit() 提交的一轮结束，最多等到 deadline（time.time() 时间）。"""
+        if future is None:
+            return
+        from concurrent.futures import TimeoutError as FuturesTimeoutError
+        try:
+            future.result(timeout=max(0.0, deadline - time.time()))
+        except FuturesTimeoutError:
+            with self.lock:
+                stragglers = list(self.running.values())
+            logging.error("本轮执行超过 %.1f 秒，%d 个协程模块未完成: %s",
+                          CYCLE_TIMEOUT_SECONDS, len(stragglers), stragglers[:20])
+            metrics.set_gauge("async_stragglers", len(stragglers))
+            return
+        except Exception as e:
+            logging.error("执行协程模块过程中出错: %s", e)
+        metrics.set_gauge("async_stragglers", 0)
+
+
+async_runner = AsyncRunner(ASYNC_MAX_CONCURRENCY)
+
+# 执行后端: thread 为全局线程池（默认）；fork 为预先 fork 的常驻工作进程，适合 CPU 密集的插件
+EXECUTION_BACKEND = os.environ.get("RUNNER_EXECUTION_BACKEND", "thread")
+FORK_WORKERS = int(os.environ.get("RUNNER_FORK_WORKERS", "0")) or cpu_count
+
+
+def _alarm_handler(signum, frame):
+    raise ModuleCancelled("执行超时")
+
+
+def _forked_worker_loop(conn, shard):
+    """
+    工作进程主循环：每收到一次命令（本分片内到期模块的下标列表），按顺序执行这些模块的 execute()，
+    每完成一个就回传一条 (name, ok, result 或错误信息)，全部完成后回传 None 作为结束标记；
+    这样父进程在本轮期限到达时能知道哪些模块已完成、哪个模块正在执行。
+    子进程里没有看门狗线程，单个模块的期限用 SIGALRM 强制中断。
+    """
+    import signal
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _alarm_handler)
+    while True:
+        try:
+            command = conn.recv()
+        except EOFError:
+            break
+        if command is None:
+            break
+        for index in command:
+            module, name = shard[index]
+            try:
+                if use_alarm:
+                    token = getattr(module, "cancel_token", None)
+                    signal.setitimer(signal.ITIMER_REAL, token.timeout if token is not None else MODULE_TIMEOUT_SECONDS)
+                result = (name, True, execute_module_method(module, name))
+            except BaseException as e:
+                result = (name, False, f"{type(e).__name__}: {e}")
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            try:
+                conn.send(result)
+            except Exception:
+                # 结果无法序列化时退回 repr
+                name, ok, value = result
+                conn.send((name, ok, value if value is None else repr(value)))
+        java_bridge.flush()
+        conn.send(None)
+
+
+class ForkedWorkerPool:
+    """
+    预先 fork 的常驻工作进程池。
+    在模块注册表加载完成后调用 gc.freeze()，再 fork 出 workers 个子进程，
+    子进程继承已加载的模块，页面保持写时复制；每个子进程固定负责一个分片的模块，
+    每个周期通过管道传一条命令（到期模块的下标），结果逐个模块回传。
+    """
+
+    def __init__(self, modules, workers):
+        from multiprocessing.connection import Pipe
+
+        workers = max(1, min(workers, len(modules)))
+        shards = [modules[i::workers] for i in range(workers)]
+        # module -> (工作进程序号, 分片内下标)
+        self.assignment = {}
+        for worker_index, shard in enumerate(shards):
+            for local_index, (module, _) in enumerate(shard):
+                self.assignment[module] = (worker_index, local_index)
+        gc.freeze()
+        self.workers = []
+        for shard in shards:
+            parent_conn, child_conn = Pipe()
+            pid = os.fork()
+            if pid == 0:
+                # 子进程：只保留自己的管道，结束时不执行父进程的清理逻辑
+                exit_code = 0
+                try:
+                    parent_conn.close()
+                    for _, other_conn, _ in self.workers:
+                        other_conn.close()
+                    _forked_worker_loop(child_conn, shard)
+                except BaseException:
+                    exit_code = 1
+                finally:
+                    log_writer.stop()
+                    os._exit(exit_code)
+            child_conn.close()
+            self.workers.append((pid, parent_conn, shard))
+        self.broken = False
+
+    def run_cycle(self, modules_to_run, deadline):
+        """
+        让工作进程执行 modules_to_run，返回 (results, stragglers, not_started)：
+        results 为已完成模块的 [(name, ok, result 或错误信息), ...]；
+        到 deadline（time.time() 时间）仍未结束的工作进程会被直接杀掉，下一轮重新 fork，
+        它当时正在执行的模块记入 stragglers，排在其后的模块记入 not_started，两者都是 [(module, name), ...]。
+        """
+        import signal
+        from multiprocessing.connection import wait
+
+        commands = [[] for _ in self.workers]
+        for module, _ in modules_to_run:
+            worker_index, local_index = self.assignment[module]
+            commands[worker_index].append(local_index)
+
+        pending = {}
+        for (pid, conn, shard), command in zip(self.workers, commands):
+            if not command:
+                continue
+            try:
+                conn.send(command)
+                # [pid, 本轮交给它的模块, 已回传结果的个数]
+                pending[conn] = [pid, [shard[i] for i in command], 0]
+            except OSError:
+                self.broken = True
+        results = []
+        while pending:
+            ready = wait(list(pending), timeout=max(0.0, deadline - time.time()))
+            if not ready:
+                break
+            for conn in ready:
+                state = pending[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    del pending[conn]
+                    self.broken = True
+                    pid, shard, done = state
+                    logging.error("执行进程 %s 异常退出，本轮 %d 个模块未执行", pid, len(shard) - done)
+                    results.extend((name, False, "worker exited") for _, name in shard[done:])
+                    continue
+                if message is None:
+                    del pending[conn]
+                else:
+                    results.append(message)
+                    state[2] += 1
+
+        stragglers = []
+        not_started = []
+        for conn, (pid, shard, done) in pending.items():
+            self.broken = True
+            logging.error("执行进程 %s 超过本轮期限 %.1f 秒，强制结束", pid, CYCLE_TIMEOUT_SECONDS)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+            # 模块按命令顺序逐个执行，第一个没有回传结果的就是被杀掉时正在执行的模块
+            if done < len(shard):
+                stragglers.append(shard[done])
+                not_started.extend(shard[done + 1:])
+        return results, stragglers, not_started
+
+    def close(self):
+        for pid, conn, _ in self.workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        for pid, _, _ in self.workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.workers = []
+
+
+forked_pool = None
+# 因超过本轮期限被强制结束的模块: module -> 放行时间（time.time()），之前的轮次跳过它们，
+# 与线程池后端跳过 in_flight_modules 的做法一致，避免每轮都派发同一个模块、杀进程、重新 fork
+forked_stragglers = {}
+
+
+def run_in_forked_workers(modules_to_run, registry_changed, deadline):
+    """
+    用常驻工作进程执行一轮；注册表变化或进程异常时重新 fork。
+    被强制结束的模块按它自身的超时时间计算放行时间，到期前（且未被重新加载）的轮次跳过它。
+    返回本轮没有开始执行的模块 [(module, name), ...]（含跳过的）；
+    当前平台不支持 fork（如 GraalPy）时返回 None，由调用方退回线程池。
+    """
+    global forked_pool
+    if not hasattr(os, "fork"):
+        return None
+    if forked_pool is not None and (registry_changed or forked_pool.broken):
+        forked_pool.close()
+        forked_pool = None
+    now = time.time()
+    live = set(map(id, loaded_modules.values()))
+    for module in [m for m, release_at in forked_stragglers.items() if release_at <= now or id(m) not in live]:
+        del forked_stragglers[module]
+    skipped = [(m, n) for m, n in modules_to_run if m in forked_stragglers]
+    if skipped:
+        logging.error("%d 个模块上一轮超过期限被强制结束，本轮跳过: %s", len(skipped), [n for _, n in skipped[:20]])
+        modules_to_run = [(m, n) for m, n in modules_to_run if m not in forked_stragglers]
+    if not modules_to_run:
+        return skipped
+    if forked_pool is None:
+        try:
+            modules = [(m, module_name_of(p)) for p, m in loaded_modules.items()]
+            forked_pool = ForkedWorkerPool(modules, FORK_WORKERS)
+        except Exception as e:
+            logging.error("创建执行进程池失败，改用线程池: %s", e)
+            return None
+
+    results, stragglers, not_started = forked_pool.run_cycle(modules_to_run, deadline)
+    for name, ok, value in results:
+        if ok:
+            result_sink.put(name, value)
+        else:
+            logging.error("执行模块 '%s' 过程中出错: %s", name, value)
+    if stragglers:
+        now = time.time()
+        for module, _ in stragglers:
+            token = getattr(module, "cancel_token", None)
+            forked_stragglers[module] = now + (token.timeout if token is not None else MODULE_TIMEOUT_SECONDS)
+        names = [n for _, n in stragglers]
+        logging.error("本轮执行超过 %.1f 秒，%d 个模块被强制结束: %s；%d 个模块未开始执行: %s",
+                      CYCLE_TIMEOUT_SECONDS, len(names), names[:20], len(not_started), [n for _, n in not_started[:20]])
+    metrics.set_gauge("stragglers", len(stragglers))
+    metrics.inc("modules_not_started", len(not_started))
+    return skipped + not_started
+
+
+# 缓冲的 processData 请求达到该数量时立即发送一批，不等周期结束
+BRIDGE_MAX_BATCH = int(os.environ.get("RUNNER_BRIDGE_MAX_BATCH", "1000"))
+
+
+# BridgeFuture 在首次 submit() 时才定义，避免启动时导入 concurrent.futures
+_bridge_future_class = None
+
+def new_bridge_future(bridge):
+    global _bridge_future_class
+    if _bridge_future_class is None:
+        from concurrent.futures import Future
+
+        class BridgeFuture(Future):
+            """JavaBridge.submit() 返回的 Future。结果未就绪时 result() 先触发一次 flush，避免等到周期结束。"""
+
+            def __init__(self, bridge):
+                super().__init__()
+                self._bridge = bridge
+
+            def result(self, timeout=None):
+                if not self.done():
+                    self._bridge.flush()
+                return super().result(timeout)
+
+            def exception(self, timeout=None):
+                if not self.done():
+                    self._bridge.flush()
+                return super().exception(timeout)
+
+        _bridge_future_class = BridgeFuture
+    return _bridge_future_class(bridge)
+
+
+class JavaBridge:
+    """
+    runner 提供给插件的 Java 桥，作为全局名 java_bridge 注入每个模块。
+    javaDataReceiver 及其 processDataFunc() 只通过 polyglot 解析一次并缓存句柄；
+    submit() 把 processData 请求缓冲起来，周期末（或缓冲满 BRIDGE_MAX_BATCH 条时）
+    通过 processDataBatch 一次跨越宿主边界发送全部请求，结果经 Future 返回给调用方。
+    宿主对象没有 processDataBatch 时退回逐条调用 processData。
+    """
+
+    def __init__(self, name="javaDataReceiver"):
+        self.name = name
+        self.lock = threading.Lock()
+        self.pending = []   # [(payload, future)]
+        self._receiver = None
+        self._process_func = None
+        self._batch_method = None
+        self._flush_scheduled = False
+
+    @property
+    def receiver(self):
+        receiver = self._receiver
+        if receiver is None:
+            import polyglot
+            receiver = polyglot.import_value(self.name)
+            if receiver is None:
+                raise LookupError(f"polyglot 绑定中没有 {self.name}")
+            self._batch_method = getattr(receiver, "processDataBatch", None)
+            self._receiver = receiver
+        return receiver
+
+    def reset(self):
+        """丢弃缓存的宿主句柄，下次使用时重新解析（宿主重新绑定对象后调用）。"""
+        self._receiver = self._process_func = self._batch_method = None
+
+    def process_data(self, data):
+        """同步调用 processData，复用缓存的句柄。"""
+        metrics.inc("java_bridge_crossings")
+        return self.receiver.processData(data)
+
+    def apply(self, data):
+        """同步调用 processDataFunc().apply，Function 对象只取一次。"""
+        process_func = self._process_func
+        if process_func is None:
+            process_func = self._process_func = self.receiver.processDataFunc()
+        metrics.inc("java_bridge_crossings")
+        return process_func.apply(data)
+
+    def submit(self, data):
+        """缓冲一条 processData 请求，返回 Future。"""
+        future = new_bridge_future(self)
+        with self.lock:
+            self.pending.append((data, future))
+            full = len(self.pending) >= BRIDGE_MAX_BATCH
+        if full:
+            self.flush()
+        return future
+
+    async def submit_async(self, data):
+        """
+        协程插件使用：result = await java_bridge.submit_async(data)。
+        事件循环同一轮中各协程提交的请求在下一轮合并成一次跨越发送，等待结果时不阻塞事件循环。
+        """
+        import asyncio
+        future = self.submit(data)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._scheduled_flush)
+        return await asyncio.wrap_future(future)
+
+    def _scheduled_flush(self):
+        self._flush_scheduled = False
+        self.flush()
+
+    def flush(self):
+        """发送所有缓冲的请求，返回本次发送的条数。"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        # 调用方已取消的请求不再发送
+        batch = [(data, future) for data, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return 0
+        payloads = [data for data, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            receiver = self.receiver
+            if self._batch_method is not None:
+                metrics.inc("java_bridge_crossings")
+                results = list(self._batch_method(payloads))
+            else:
+                metrics.inc("java_bridge_crossings", len(payloads))
+                results = [receiver.processData(data) for data in payloads]
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        metrics.inc("java_bridge_payloads", len(payloads))
+        return len(payloads)
+
+
+java_bridge = JavaBridge()
+
+
+def _reinit_locks_in_child():
+    """
+    fork 时其他线程（滞留的线程池线程、结果写出线程、事件循环线程等）可能正持有这些锁，
+    子进程里不会有人释放它们；编译进程和执行进程都会用到，换成新锁。
+    """
+    metrics.lock = threading.Lock()
+    watchdog.lock = threading.Lock()
+    java_bridge.lock = threading.Lock()
+    async_runner.lock = threading.Lock()
+    dependency_graph.lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_locks_in_child)
+
+
+# 注入插件的 HTTP 客户端（全局名 http_client）：每个主机同时使用的连接上限、默认超时（秒）、空闲连接保留时间（秒）
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("RUNNER_HTTP_MAX_PER_HOST", "4"))
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("RUNNER_HTTP_TIMEOUT", "5"))
+HTTP_IDLE_SECONDS = float(os.environ.get("RUNNER_HTTP_IDLE", "30"))
+# GET 响应缓存：响应未声明 Cache-Control: max-age 时的有效期（秒，0 表示每次都用 ETag/Last-Modified 重新验证）与条目上限
+HTTP_CACHE_TTL_SECONDS = float(os.environ.get("RUNNER_HTTP_CACHE_TTL", "0"))
+HTTP_CACHE_MAX_ENTRIES = int(os.environ.get("RUNNER_HTTP_CACHE_MAX_ENTRIES", "1024"))
+
+# 复用的空闲连接已被服务器关闭时，这些方法换新连接重试一次
+HTTP_RETRY_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpResponse:
+    """HTTP 响应，接口与 requests.Response 的常用部分一致；headers 的键为小写。"""
+    __slots__ = ("url", "status_code", "headers", "content", "from_cache")
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", "replace")
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HttpError(f"HTTP {self.status_code}: {self.url}")
+
+
+class _HostPool:
+    __slots__ = ("slots", "idle")
+
+    def __init__(self, limit):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.idle = []  # [(connection, idle_since)]，末尾为最近归还的连接
+
+
+class _CacheEntry:
+    __slots__ = ("expires", "etag", "last_modified", "response")
+
+    def __init__(self, expires, etag, last_modified, response):
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        self.response = response
+
+
+class HttpClient:
+    """
+    runner 持有的 HTTP 客户端，作为全局名 http_client 注入每个模块（插件本身不能导入 requests/http/socket）。
+    - 按 (scheme, host, port) 复用 keep-alive 连接，每个主机同时使用的连接不超过 max_per_host，
+      超出的请求等待空闲连接，等待和请求本身都受 timeout 限制；
+    - GET 的 2xx 响应按 URL 和请求头缓存：有效期内直接返回缓存，过期后带 If-None-Match/If-Modified-Since
+      重新验证，服务器返回 304 时沿用缓存的响应体。有效期取 Cache-Control: max-age，没有时取 cache_ttl；
+      no-store 的响应不缓存。
+    http.client 等在首次请求时才导入。协程插件用 await http_client.get_async(...)，不阻塞事件循环。
+    """
+
+    def __init__(self, max_per_host, timeout, idle_seconds, cache_ttl, cache_max_entries):
+        self.max_per_host = max(1, max_per_host)
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.cache_ttl = cache_ttl
+        self.cache_max_entries = cache_max_entries
+        self.lock = threading.Lock()
+        self.pools = {}  # (scheme, host, port) -> _HostPool
+        self.cache = collections.OrderedDict()  # (url, headers) -> _CacheEntry，按最近使用排序
+
+    def get(self, url, headers=None, timeout=None, cache=True):
+        return self.request("GET", url, headers=headers, timeout=timeout, cache=cache)
+
+    def post(self, url, data=None, json=None, headers=None, timeout=None):
+        headers = dict(headers or {})
+        if json is not None:
+            import json as json_module
+            data = json_module.dumps(json).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        elif isinstance(data, str):
+            data = data.encode("utf-8")
+        return self.request("POST", url, body=data, headers=headers, timeout=timeout)
+
+    async def get_async(self, url, **kwargs):
+        """协程插件使用：在事件循环的默认线程池中执行 get()。"""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: self.get(url, **kwargs))
+
+    def request(self, method, url, body=None, headers=None, timeout=None, cache=True):
+        method = method.upper()
+        headers = dict(headers or {})
+        timeout = timeout or self.timeout
+        metrics.inc("http_requests")
+        if method != "GET" or not cache:
+            return self._fetch(method, url, body, headers, timeout)
+
+        key = (url, tuple(sorted(headers.items())))
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                metrics.inc("http_cache_hits")
+                return self._cached(entry)
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response = self._fetch(method, url, body, headers, timeout)
+        if entry is not None and response.status_code == 304:
+            metrics.inc("http_cache_revalidations")
+            entry.expires = self._expires(response.headers)
+            return self._cached(entry)
+        self._store(key, response)
+        return response
+
+    @staticmethod
+    def _cached(entry):
+        cached = entry.response
+        return HttpResponse(cached.url, cached.status_code, cached.headers, cached.content, from_cache=True)
+
+    def _expires(self, headers):
+        now = time.monotonic()
+        for directive in headers.get("cache-control", "").lower().split(","):
+            name, _, value = directive.strip().partition("=")
+            if name in ("no-cache", "no-store"):
+                return now
+            if name == "max-age":
+                try:
+                    return now + max(0, int(value.strip('"')))
+                except ValueError:
+                    return now
+        return now + self.cache_ttl
+
+    def _store(self, key, response):
+        headers = response.headers
+        if not 200 <= response.status_code < 300 or "no-store" in headers.get("cache-control", "").lower():
+            return
+        expires = self._expires(headers)
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified and expires <= time.monotonic():
+            return  # 既不能重新验证也没有有效期，缓存不会被用到
+        with self.lock:
+            self.cache[key] = _CacheEntry(expires, etag, last_modified, response)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_max_entries:
+                self.cache.popitem(last=False)
+
+    def _fetch(self, method, url, body, headers, timeout):
+        from urllib.parse import urlsplit
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"不支持的 URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        pool = self._pool((parts.scheme, parts.hostname, port))
+        if not pool.slots.acquire(timeout=timeout):
+            metrics.inc("http_errors")
+            raise HttpError(f"等待 {parts.hostname}:{port} 的空闲连接超过 {timeout:.1f} 秒")
+        try:
+            return self._send(pool, parts.scheme, parts.hostname, port, method, target, url, body, headers, timeout)
+        except Exception:
+            metrics.inc("http_errors")
+            raise
+        finally:
+            pool.slots.release()
+
+    def _send(self, pool, scheme, host, port, method, target, url, body, headers, timeout):
+        import http.client
+        while True:
+            conn, reused = self._checkout(pool, scheme, host, port, timeout)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, target, body=body, headers=headers)
+                response = conn.getresponse()
+                content = response.read()
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                if reused and method in HTTP_RETRY_METHODS:
+                    continue  # 服务器已关闭这条空闲连接，换一条再试
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    pool.idle.append((conn, time.monotonic()))
+            return HttpResponse(url, response.status, {k.lower(): v for k, v in response.getheaders()}, content)
+
+    def _pool(self, host_key):
+        pool = self.pools.get(host_key)
+        if pool is None:
+            with self.lock:
+                pool = self.pools.setdefault(host_key, _HostPool(self.max_per_host))
+        return pool
+
+    def _checkout(self, pool, scheme, host, port, timeout):
+        """取最近归还的空闲连接，丢弃空闲过久的；没有可用的连接时新建。返回 (connection, 是否复用)。"""
+        stale = []
+        conn = None
+        with self.lock:
+            cutoff = time.monotonic() - self.idle_seconds
+            while pool.idle:
+                candidate, idle_since = pool.idle.pop()
+                if idle_since >= cutoff:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if conn is not None:
+            metrics.inc("http_connections_reused")
+            return conn, True
+        import http.client
+        factory = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        metrics.inc("http_connections_opened")
+        return factory(host, port, timeout=timeout), False
+
+    def close(self):
+        """关闭所有空闲连接。"""
+        with self.lock:
+            idle = [conn for pool in self.pools.values() for conn, _ in pool.idle]
+            for pool in self.pools.values():
+                pool.idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def _after_fork_in_child(self):
+        # 子进程不能与父进程共用连接，只丢弃引用；缓存可以继续使用
+        self.lock = threading.Lock()
+        self.pools = {}
+
+
+http_client = HttpClient(HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_TIMEOUT_SECONDS, HTTP_IDLE_SECONDS,
+                         HTTP_CACHE_TTL_SECONDS, HTTP_CACHE_MAX_ENTRIES)
+atexit.register(http_client.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=http_client._after_fork_in_child)
+
+
+# 插件 execute() 返回值的去向: polyglot 按批编码后通过 javaDataReceiver.processResults 一次交给宿主
+# （宿主没有该方法时改写文件），file 追加写入 RESULTS_FILE，off 丢弃
+RESULTS_SINK = os.environ.get("RUNNER_RESULTS_SINK", "polyglot")
+RESULTS_FILE = os.environ.get("RUNNER_RESULTS_FILE", "python_results.jsonl")
+# 每批最多的结果条数；第一条结果进入批次后最多等待 RESULTS_FLUSH_SECONDS 秒就发送
+RESULTS_BATCH_SIZE = int(os.environ.get("RUNNER_RESULTS_BATCH", "500"))
+RESULTS_FLUSH_SECONDS = float(os.environ.get("RUNNER_RESULTS_FLUSH_SECONDS", "1"))
+# 待发送结果的队列容量；队列满时生产者最多等待 RESULTS_BLOCK_SECONDS 秒，之后丢弃并计数
+RESULTS_QUEUE_SIZE = int(os.environ.get("RUNNER_RESULTS_QUEUE_SIZE", "10000"))
+RESULTS_BLOCK_SECONDS = float(os.environ.get("RUNNER_RESULTS_BLOCK_SECONDS", "1"))
+
+
+class ResultSink:
+    """
+    插件执行结果的批量出口。执行线程调用 put() 把结果放进有界队列后即返回，
+    后台线程 runner-results 攒满一批或到达时间窗口后，把整批编码成 JSON Lines
+    （每行 [模块名, 结果, 时间戳]，不能 JSON 序列化的结果用 repr）一次写出：
+    一次 polyglot 调用，或一次追加写文件。
+    消费端变慢时队列逐渐填满，put() 阻塞生产者，从而拖慢执行端；返回 None 的执行不产生结果。
+    """
+    _STOP = object()
+
+    def __init__(self, mode, file_path, batch_size, flush_seconds, queue_size, block_seconds):
+        self.mode = mode
+        self.file_path = file_path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.queue_size = queue_size
+        self.block_seconds = block_seconds
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(queue_size)
+        self.thread = None
+        self._file = None
+        self._host_method = None
+
+    def put(self, module_name, result, block=True):
+        """提交一条结果；block=False 时队列满立即丢弃（事件循环线程上不能阻塞）。"""
+        if result is None or self.mode == "off":
+            return
+        if self.thread is None:
+            self._start()
+        item = (module_name, result, time.time())
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            metrics.inc("results_backpressure")
+        try:
+            if not block:
+                raise queue.Full
+            self.queue.put(item, timeout=self.block_seconds)
+        except queue.Full:
+            metrics.inc("results_dropped")
+
+    def close(self, timeout=5):
+        """发送队列中剩余的结果并停止后台线程。"""
+        thread = self.thread
+        if thread is None:
+            return
+        try:
+            self.queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                thread = threading.Thread(target=self._run, name="runner-results", daemon=True)
+                thread.start()
+                self.thread = thread
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            try:
+                item = self.queue.get(timeout=None if not batch else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None  # 时间窗口已到
+            if item is self._STOP:
+                self._write(batch)
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_seconds
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            self._write(batch)
+            batch = []
+
+    def _write(self, batch):
+        if not batch:
+            return
+        import json
+        lines = []
+        for item in batch:
+            try:
+                lines.append(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            except (TypeError, ValueError):
+                name, result, timestamp = item
+                lines.append(json.dumps((name, repr(result), timestamp), ensure_ascii=False, separators=(",", ":")))
+        payload = "\n".join(lines) + "\n"
+        start = time.perf_counter()
+        try:
+            if not (self.mode == "polyglot" and self._send_to_host(payload)):
+                self._append(payload)
+        except Exception as e:
+            metrics.inc("results_dropped", len(batch))
+            logging.error("写出 %d 条执行结果失败: %s", len(batch), e)
+            return
+        metrics.observe_phase("results_flush", time.perf_counter() - start)
+        metrics.inc("results_batches")
+        metrics.inc("results_sent", len(batch))
+
+    def _send_to_host(self, payload):
+        method = self._host_method
+        if method is None:
+            try:
+                method = getattr(java_bridge.receiver, "processResults", None)
+            except Exception as e:
+                method = None
+                logging.info("宿主对象不可用: %s", e)
+            if method is None:
+                logging.warning("宿主没有 processResults，执行结果改为追加写入 %s", self.file_path)
+                self.mode = "file"
+                return False
+            self._host_method = method
+        metrics.inc("java_bridge_crossings")
+        method(payload)
+        return True
+
+    def _append(self, payload):
+        if self._file is None:
+            self._file = open(self.file_path, "a", encoding="utf-8")
+        self._file.write(payload)
+        self._file.flush()
+
+    def _after_fork_in_child(self):
+        # 子进程的结果经管道交回父进程，由父进程写出；这里只丢弃继承来的队列和线程状态
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(self.queue_size)
+        self.thread = None
+        self._file = None
+
+
+result_sink = ResultSink(RESULTS_SINK, RESULTS_FILE, RESULTS_BATCH_SIZE, RESULTS_FLUSH_SECONDS,
+                         RESULTS_QUEUE_SIZE, RESULTS_BLOCK_SECONDS)
+atexit.register(result_sink.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=result_sink._after_fork_in_child)
+
+
 def call_java_object():
     try:
-        import polyglot
-        java_receiver = polyglot.import_value("javaDataReceiver")
         data_to_send = "Hello from Python to Java"
-        result = java_receiver.processData(data_to_send)
+        result = java_bridge.process_data(data_to_send)
         logging.info("Java 对象返回结果: %s", result)
     except Exception as e:
         logging.error("调用 Java 对象出错: %s", e)
 
+
+# runner.py 初始化（即宿主 eval 本脚本）的耗时预算（秒），超出时记录最慢的导入；0 表示不检查
+STARTUP_BUDGET_SECONDS = float(os.environ.get("RUNNER_STARTUP_BUDGET", "0"))
+
+
+def runner_startup_report():
+    """返回启动耗时与各模块导入耗时（JSON 字符串），供宿主通过 polyglot 绑定 runnerStartupReport 调用。"""
+    import json
+    return json.dumps({"startup_seconds": round(startup_seconds, 6),
+                       "budget_seconds": STARTUP_BUDGET_SECONDS,
+                       "imports": import_timer.report()}, ensure_ascii=False)
+
+
+import_timer.stop()
+startup_seconds = time.perf_counter() - _runner_started
+metrics.set_gauge("startup_seconds", round(startup_seconds, 6))
+if STARTUP_BUDGET_SECONDS and startup_seconds > STARTUP_BUDGET_SECONDS:
+    logging.error("runner.py 初始化耗时 %.3f 秒，超出预算 %.3f 秒，最慢的导入: %s",
+                  startup_seconds, STARTUP_BUDGET_SECONDS, import_timer.report(5))
+
+try:
+    import polyglot
+    polyglot.export_value("runnerStartupReport", runner_startup_report)
+    polyglot.export_value("runnerDependencyGraph", runner_dependency_graph)
+except Exception as e:
+    logging.info("未导出 runnerStartupReport、runnerDependencyGraph 绑定: %s", e)
+
 # if __name__ == '__main__':
 #     import gc
 #     while True:
@@ -5,7 +5,6 @@ import logging
 import importlib.util
 
 import random
-import requests
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,6 +33,7 @@ def load_all_py_files(base_dir=None):
     logging.info("Searching for .py files in directory: %s", base_dir)
     
     # 发送一个简单的 HTTP 请求（示例功能）
+    import requests
     try:
         r = requests.get('https://www.baidu.com')
         logging.info("Request to Baidu completed, status code: %s", r.status_code)
@@ -4,8 +4,6 @@ import time
 import logging
 import importlib.util
 import random
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,6 +30,7 @@ def load_all_py_files(base_dir=None):
     logging.info("Searching for .py files in directory: %s", base_dir)
 
     # 可选：发送一个 HTTP 请求作为示例行为
+    import requests
     try:
         r = requests.get('https://www.baidu.com', timeout=5)
         logging.info("Request to Baidu completed, status code: %s", r.status_code)
@@ -69,6 +68,7 @@ def load_all_py_files(base_dir=None):
     results = []
     # 获取 CPU 核心数（如果为 None，默认设置为 4）
     cpu_count = os.cpu_count() or 4
+    from concurrent.futures import ThreadPoolExecutor, as_completed
     with ThreadPoolExecutor(max_workers=cpu_count) as executor:
         future_to_name = {executor.submit(execute_module_method, m, n): n for m, n in modules_to_run}
         for future in as_completed(future_to_name):
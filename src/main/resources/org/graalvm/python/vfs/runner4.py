@@ -5,8 +5,6 @@ import logging
 import ast
 import types
 import random
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -64,6 +62,7 @@ def load_all_py_files():
 
     logging.info("Searching for .py files in directory: %s", base_dir)
 
+    import requests
     try:
         r = requests.get('https://www.baidu.com', timeout=5)
         logging.info("Request to Baidu completed, status code: %s", r.status_code)
@@ -83,6 +82,7 @@ def load_all_py_files():
 
     results = []
     cpu_count = os.cpu_count() or 4
+    from concurrent.futures import ThreadPoolExecutor, as_completed
     with ThreadPoolExecutor(max_workers=cpu_count) as executor:
         future_to_name = {executor.submit(execute_module_method, m, n): n for m, n in modules_to_run}
         for future in as_completed(future_to_name):
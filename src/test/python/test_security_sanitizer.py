@@ -0,0 +1,63 @@
+"""
+SecuritySanitizer 对点分禁止项的检查：from a import b 要按 a.b 判定，不能只看 a。
+
+运行:
+    python -m unittest discover -s src/test/python
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+RUNNER = os.path.join(ROOT, "src", "main", "resources", "org", "graalvm", "python", "vfs", "runner.py")
+STUBS_DIR = os.path.join(ROOT, "bench", "stubs")
+
+
+def load_runner():
+    """与 PythonRunnerTask 相同，把 runner.py exec 到一个新的命名空间；日志等输出文件写到临时目录。"""
+    if STUBS_DIR not in sys.path:
+        sys.path.insert(0, STUBS_DIR)
+    workdir = tempfile.mkdtemp(prefix="runner-test-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        namespace = {"__name__": "runner_test"}
+        with open(RUNNER, encoding="utf-8") as f:
+            exec(compile(f.read(), RUNNER, "exec"), namespace)
+    finally:
+        os.chdir(cwd)
+    return namespace
+
+
+class DottedDenyTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.runner = load_runner()
+        cls.runner["set_module_policy"](cls.runner["ModulePolicy"](["xml.dom", "concurrent.futures.process"]))
+
+    def sanitize(self, source):
+        code, _ = self.runner["compile_sanitized"](source, "<test>")
+        return set(code.co_names)
+
+    def test_from_import_of_denied_submodule_is_removed(self):
+        self.assertNotIn("dom", self.sanitize("from xml import dom\n"))
+        self.assertNotIn("process", self.sanitize("from concurrent.futures import process\n"))
+
+    def test_mixed_names_drop_whole_statement(self):
+        names = self.sanitize("from xml import etree, dom\n")
+        self.assertNotIn("etree", names)
+        self.assertNotIn("dom", names)
+
+    def test_plain_import_of_denied_module_is_removed(self):
+        self.assertNotIn("xml", self.sanitize("import xml.dom\n"))
+
+    def test_allowed_siblings_are_kept(self):
+        self.assertIn("etree", self.sanitize("from xml import etree\n"))
+        self.assertIn("thread", self.sanitize("from concurrent.futures import thread\n"))
+        self.assertIn("x", self.sanitize("from xml import *\nx = 1\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()